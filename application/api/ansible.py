@@ -3,9 +3,12 @@ Ansible Api
 """
 # pylint: disable=function-redefined
 # pylint: disable=no-member
+import gzip
+from flask import request, make_response, Response, stream_with_context
 from flask_restx import Namespace, Resource
 from application.api import require_token
 from application.modules.ansible.syncer import SyncAnsible
+from application.modules.ansible.inventory import InventorySnapshot
 from application.plugins.ansible import load_rules
 
 API = Namespace('ansible')
@@ -17,13 +20,38 @@ class AnsibleApi(Resource):
 
     @require_token
     def get(self):
-        """ Return complete Ansible Inventory """
-        rules = load_rules()
-        syncer = SyncAnsible()
-        syncer.filter = rules['filter']
-        syncer.rewrite = rules['rewrite']
-        syncer.actions = rules['actions']
-        return syncer.get_full_inventory()
+        """
+        Return complete Ansible Inventory.
+        Served from the Snapshot, which is only updated if Hosts or Rules changed.
+        Supports If-None-Match and gzip, or with ?stream=1 a chunked Response
+        """
+        snapshot = InventorySnapshot(load_rules)
+        state = snapshot.update()
+        etag = state.etag
+        if not etag:
+            # Never serve an empty Inventory, Ansible would remove all Hosts
+            return {'error': "Inventory not built yet"}, 503
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+            response.set_etag(etag)
+            return response
+
+        if request.args.get('stream'):
+            response = Response(stream_with_context(snapshot.iter_json(state.version)),
+                                mimetype='application/json')
+            response.set_etag(etag)
+            return response
+
+        content = snapshot.get_compressed(state)
+        response = make_response(content)
+        if 'gzip' in request.accept_encodings:
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response.set_data(gzip.decompress(content))
+        response.headers['Content-Type'] = 'application/json'
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.set_etag(etag)
+        return response
 
 @API.route('/<hostname>')
 class AnsibleDetailApi(Resource):
@@ -60,6 +60,15 @@ class BaseConfig():
 
     DISABLE_SSL_ERRORS = True
     HTTP_REQUEST_TIMEOUT = 30
+    HTTP_CONNECT_TIMEOUT = 10
+
+    # Plugins keep one Session with a Connection Pool per Account.
+    # Idempotent Requests are retried with Backoff on this Status Codes,
+    # Account Custom Field 'request_timeout' overwrites HTTP_REQUEST_TIMEOUT
+    HTTP_POOL_SIZE = 20
+    HTTP_MAX_RETRIES = 3
+    HTTP_RETRY_BACKOFF = 0.5
+    HTTP_RETRY_STATUS = [429, 500, 502, 503, 504]
 
     SWAGGER_ENABLED = True
     DEBUG = True
@@ -74,6 +83,30 @@ class BaseConfig():
 
     FILEADMIN_PATH = '/srv/cmdbsyncer-files'
 
+    # Number of compiled Jinja Templates kept per Process
+    JINJA_TEMPLATE_CACHE_SIZE = 2000
+
+    # Rule Outcomes kept per Process. Hosts with the same
+    # Attributes share one Entry, if no Hostname Condition is used
+    RULE_OUTCOME_CACHE_SIZE = 50000
+
+    # Changed Host Caches are collected and
+    # written with one bulk_write per this amount of Hosts
+    HOST_UPDATE_BATCH_SIZE = 500
+
+    # Hosts fetched per Round Trip when Exporters iterate all Hosts
+    HOST_CURSOR_BATCH_SIZE = 1000
+
+    ### Ansible Stuff
+
+    # Only one Process updates the Inventory Snapshot at the same time.
+    # The Lease is renewed while building, and taken over after
+    # this Seconds if the Process died
+    ANSIBLE_INVENTORY_LEASE_SECONDS = 300
+    # Change Sequence Numbers are reserved before the Hosts are written,
+    # so Hosts this far below the highest seen Number are checked again
+    ANSIBLE_INVENTORY_SEQ_OVERLAP = 2000
+
     ### Checkmk Stuff
 
     #Checkmk has a bug:
@@ -101,6 +134,31 @@ class BaseConfig():
     # Activating this, Syncer will query Hosts Folder by Folder.
     # That will take longer, but will not break Checkmk.
     CMK_GET_HOST_BY_FOLDER = False
+    # Number of Folders requested at the same time
+    CMK_FETCH_CONCURRENCY = 8
+    # Bytes read at once, when Host Collections are streamed
+    CMK_STREAM_CHUNK_SIZE = 65536
+
+    # Hosts are calculated in Batches by Worker Processes.
+    # Processes None means one per CPU
+    CMK_CALCULATION_BATCH_SIZE = 250
+    CMK_CALCULATION_PROCESSES = None
+    # Calculation and Checkmk Requests run at the same time.
+    # Batches calculated ahead of the Sync and Bulk Requests
+    # waiting for the Sender, before the other Side has to wait
+    CMK_CALCULATION_QUEUE_SIZE = 4
+    CMK_BULK_QUEUE_SIZE = 4
+    # Bulk Requests sent to Checkmk at the same time. The Syncer starts
+    # with one, and goes up as long as Checkmk answers fast. If the Response
+    # Time grows by CMK_SEND_SLOWDOWN_FACTOR, less Requests are sent again.
+    CMK_SEND_PARALLEL = 4
+    CMK_SEND_SLOWDOWN_FACTOR = 2.0
+
+    # Only send Hosts whose Payload changed since the last Export.
+    # Every CMK_FULL_RECONCILE_HOURS (or with --full) all Hosts
+    # are fetched from Checkmk and compared again.
+    CMK_INCREMENTAL_EXPORT = False
+    CMK_FULL_RECONCILE_HOURS = 24
 
     # Log all Changed done on Hosts
     CMK_DETAILED_LOG = False
@@ -0,0 +1,72 @@
+"""
+Index of all Attribute Keys and Values
+"""
+from bisect import bisect_left
+
+
+class AttributeIndex():
+    """
+    Which Values exist for a Key, and which Keys have a Value.
+
+    Keys and Values are stored as Strings in Sets,
+    so adding a Host is independent of how many exist already.
+    A sorted List of the Keys allows to find all Keys
+    with a Prefix without looking at all of them.
+    """
+
+    def __init__(self):
+        self.values_by_key = {}
+        self.keys_by_value = {}
+        self._sorted_keys = None
+
+    def add(self, attributes):
+        """
+        Add the Attributes of a Host
+        """
+        for key, value in attributes.items():
+            key, value = str(key), str(value)
+            if key not in self.values_by_key:
+                self.values_by_key[key] = set()
+                self._sorted_keys = None
+            self.values_by_key[key].add(value)
+            self.keys_by_value.setdefault(value, set()).add(key)
+
+    def get_sorted_keys(self):
+        """
+        Return all Keys, sorted
+        """
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self.values_by_key)
+        return self._sorted_keys
+
+    def get_keys_by_prefix(self, prefix):
+        """
+        Return all Keys starting with prefix
+        """
+        keys = self.get_sorted_keys()
+        start = bisect_left(keys, prefix)
+        found = []
+        for key in keys[start:]:
+            if not key.startswith(prefix):
+                break
+            found.append(key)
+        return found
+
+    def get_values(self, key):
+        """
+        Return the Values of key, sorted.
+        Key ending with * is used as Prefix.
+        """
+        if key.endswith('*'):
+            values = set()
+            for found in self.get_keys_by_prefix(key[:-1]):
+                values.update(self.values_by_key[found])
+        else:
+            values = self.values_by_key.get(key, ())
+        return sorted(values)
+
+    def get_keys(self, value):
+        """
+        Return the Keys which have value, sorted
+        """
+        return sorted(self.keys_by_value.get(value, ()))
@@ -0,0 +1,54 @@
+"""
+Hits and Misses of the Caches used while calculating Hosts
+"""
+import os
+from application.helpers.syncer_jinja import get_template_cache_stats
+from application.modules.rule.outcome_cache import outcome_cache
+
+
+def get_cache_stats():
+    """
+    Return Process ID and the Stats of the Outcome and Template Cache.
+    The Counters are per Process, so Workers send them with their Results.
+    """
+    return os.getpid(), {
+        'outcomes': outcome_cache.get_stats(),
+        'templates': get_template_cache_stats(),
+    }
+
+
+class CacheStats():
+    """
+    Collect the Stats of all Processes of a Run.
+    Counters only grow, so the last Stats of every Process are kept.
+
+    Create it before the Workers are forked: they start with the
+    Counters of this Process, which are subtracted as Baseline.
+    """
+
+    def __init__(self):
+        self.by_process = {}
+        self.baseline = get_cache_stats()[1]
+
+    def add(self, process_stats):
+        """
+        Add Result of get_cache_stats()
+        """
+        pid, stats = process_stats
+        self.by_process[pid] = stats
+
+    def get_summary(self):
+        """
+        Return short Text with Hits, Misses and Hit Ratio per Cache
+        """
+        self.add(get_cache_stats())
+        parts = []
+        for cache_name in ('outcomes', 'templates'):
+            base = self.baseline[cache_name]
+            hits = sum(x[cache_name]['hits'] - base['hits'] \
+                            for x in self.by_process.values())
+            misses = sum(x[cache_name]['misses'] - base['misses'] \
+                            for x in self.by_process.values())
+            ratio = 100 * hits / (hits + misses) if hits + misses else 0
+            parts.append(f"{cache_name}: {hits} hits, {misses} misses ({ratio:.1f}%)")
+        return ", ".join(parts)
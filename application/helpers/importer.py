@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Import Helpers
+"""
+#pylint: disable=logging-fstring-interpolation, protected-access
+import datetime
+from pymongo import UpdateOne
+from application import app, logger
+from application.models.host import Host, reserve_change_seq
+from application.modules.debug import ColorCodes as CC
+
+# Not needed to compare the Hosts, only written
+SKIPPED_FIELDS = ('log', 'raw', 'cache')
+
+class HostImporter():
+    """
+    Import Hosts of an Account in Batches.
+
+    All Hosts of the Account are loaded with one Query,
+    Labels are compared in memory and only the Changes
+    are written with one bulk_write per Batch.
+
+    Usage:
+        importer = HostImporter(config)
+        for hostname, labels in source:
+            importer.add(hostname, labels)
+        importer.finish()
+    """
+
+    def __init__(self, account, batch_size=None):
+        """
+        Args:
+            account (dict): Full Account Config (get_account_by_name)
+            batch_size (int): Rows per bulk_write, default HOST_UPDATE_BATCH_SIZE
+        """
+        self.account = account
+        self.batch_size = batch_size or app.config['HOST_UPDATE_BATCH_SIZE']
+        self.batch = []
+        self.seen = set()
+        self.stats = {
+            'created': 0,
+            'updated': 0,
+            'unchanged': 0,
+            'other_master': 0,
+        }
+        # pylint: disable=no-member
+        self.hosts = {x.hostname: x for x in \
+                        Host.objects(source_account_id=self.account['id'])\
+                            .exclude(*SKIPPED_FIELDS)}
+        self.account_host_ids = {x.hostname: x.pk for x in self.hosts.values()}
+
+    def add(self, hostname, labels):
+        """
+        Add Row of the Source
+        """
+        if app.config['LOWERCASE_HOSTNAMES']:
+            hostname = hostname.lower()
+        self.batch.append((hostname, labels))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def _load_missing_hosts(self):
+        """
+        Load Hosts of the Batch, which are not owned by this Account yet,
+        with one Query
+        """
+        missing = {x for x, _ in self.batch if x not in self.hosts}
+        if not missing:
+            return
+        # pylint: disable=no-member
+        for host in Host.objects(hostname__in=list(missing)).exclude(*SKIPPED_FIELDS):
+            self.hosts[host.hostname] = host
+
+    def _get_operation(self, host_obj):
+        """
+        Return the UpdateOne Operation for the changed Fields of the Host,
+        or None if nothing changed.
+        Log and Cache of existing Hosts are not loaded,
+        so new Log Entries are pushed in front of the stored ones.
+        """
+        if not host_obj.pk:
+            host_obj.validate()
+            data = host_obj.to_mongo().to_dict()
+            data.pop('_id', None)
+            self.stats['created'] += 1
+            return UpdateOne({'hostname': host_obj.hostname}, {'$set': data}, upsert=True)
+
+        set_data, unset_data = host_obj._delta()
+        if not set_data and not unset_data:
+            self.stats['unchanged'] += 1
+            return None
+        update = {}
+        if new_entries := set_data.pop('log', None):
+            update['$push'] = {'log': {'$each': new_entries, '$position': 0,
+                                       '$slice': app.config['HOST_LOG_LENGTH']}}
+        if set_data:
+            update['$set'] = set_data
+        if unset_data:
+            update['$unset'] = unset_data
+        self.stats['updated'] += 1
+        return UpdateOne({'_id': host_obj.pk}, update)
+
+    def flush(self):
+        """
+        Write the current Batch
+        """
+        if not self.batch:
+            return
+        self._load_missing_hosts()
+        # Same Host twice in the Batch: the last Row wins
+        changed_hosts = {}
+        for hostname, labels in self.batch:
+            if hostname not in self.hosts:
+                self.hosts[hostname] = Host(hostname=hostname)
+            host_obj = self.hosts[hostname]
+            # Like Host.update_host, but last_import_seen is set
+            # for all Hosts at once in finish()
+            if host_obj.get_labels() != labels:
+                host_obj.set_import_sync()
+                host_obj.set_labels(labels)
+                # Cache is not loaded, clearing it alone is no Change
+                host_obj._mark_as_changed('cache')
+            elif not host_obj.available:
+                host_obj.available = True
+                host_obj.mark_changed()
+            if not host_obj.set_account(account_dict=self.account):
+                self.stats['other_master'] += 1
+                print(f" {CC.WARNING} * {CC.ENDC} {hostname}: Managed by diffrent master")
+                continue
+            self.seen.add(hostname)
+            changed_hosts[hostname] = host_obj
+        self.batch = []
+
+        pending = [x for x in changed_hosts.values() if x.has_pending_change()]
+        if pending:
+            first_seq = reserve_change_seq(len(pending))
+            for change_seq, host_obj in enumerate(pending, start=first_seq):
+                host_obj.assign_change_seq(change_seq)
+
+        operations = {}
+        for hostname, host_obj in changed_hosts.items():
+            if operation := self._get_operation(host_obj):
+                operations[hostname] = (host_obj, operation)
+
+        if operations:
+            logger.debug(f"Write {len(operations)} Host Changes")
+            Host._get_collection().bulk_write([x[1] for x in operations.values()],
+                                              ordered=False)
+            for host_obj, _operation in operations.values():
+                host_obj._clear_changed_fields()
+
+    def mark_seen(self):
+        """
+        Set last_import_seen for all Hosts found in the Source,
+        with one update_many per Batch
+        """
+        now = datetime.datetime.now()
+        seen = list(self.seen)
+        for start in range(0, len(seen), self.batch_size):
+            Host._get_collection().update_many(
+                {'hostname': {'$in': seen[start:start + self.batch_size]}},
+                {'$set': {'last_import_seen': now}})
+
+    def mark_not_seen(self):
+        """
+        Mark all Hosts of the Account which are not in
+        the Source anymore, with one update_many
+        """
+        not_seen = [host_id for hostname, host_id in self.account_host_ids.items()
+                    if hostname not in self.seen]
+        if not not_seen:
+            return 0
+        now = datetime.datetime.now()
+        date = now.strftime(app.config['TIME_STAMP_FORMAT'])
+        result = Host._get_collection().update_many(
+            {'_id': {'$in': not_seen}, 'available': True},
+            {
+                '$set': {
+                    'available': False,
+                    'changed_at': now,
+                    'change_seq': reserve_change_seq(),
+                },
+                '$push': {'log': {
+                    '$each': [f"{date} Not found on Source anymore"],
+                    '$position': 0,
+                    '$slice': app.config['HOST_LOG_LENGTH'],
+                }},
+            })
+        return result.modified_count
+
+    def finish(self):
+        """
+        Write the last Batch and mark Hosts not found anymore.
+        If the Source returned no Host at all, nothing is marked,
+        since this is more likely a Problem with the Source.
+        """
+        self.flush()
+        not_found = 0
+        if self.seen:
+            self.mark_seen()
+            not_found = self.mark_not_seen()
+        print(f"{CC.OKBLUE}Import done:{CC.ENDC} "
+              f"{self.stats['created']} created, {self.stats['updated']} updated, "
+              f"{self.stats['unchanged']} unchanged, "
+              f"{self.stats['other_master']} managed by other master, "
+              f"{not_found} not found anymore")
+        return self.stats
@@ -25,6 +25,8 @@ def run_inventory(config, objects):
     """
     inv_key = config['inventorize_key']
     collected_by_key = {}
+    if config.get('inventorize_match_by_domain'):
+        Host.backfill_hostname_reversed()
     for hostname, labels in objects:
         if collect_key := config.get('inventorize_collect_by_key'):
             if value := labels.get(collect_key):
@@ -36,7 +38,7 @@ def run_inventory(config, objects):
                     collected_by_key[value].append(hostname)
 
         if config.get('inventorize_match_by_domain'):
-            for host_obj in Host.objects(hostname__endswith=hostname):
+            for host_obj in Host.get_by_domain(hostname):
                 _innter_inventorize(host_obj, labels, inv_key, config)
         else:
             host_obj = Host.get_host(hostname, create=False)
@@ -0,0 +1,113 @@
+"""
+Streaming JSON Helpers
+"""
+import codecs
+import json
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = ',]}' + _WHITESPACE
+
+
+class _Reader():
+    """
+    Text Buffer which is filled from an Iterator of Byte Chunks
+    only when more Data is needed
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """
+        Append next Chunk and drop everything already parsed.
+        Returns False if there is no more Data.
+        """
+        if self.eof:
+            return False
+        try:
+            text = self.decoder.decode(next(self.chunks))
+        except StopIteration:
+            self.eof = True
+            text = self.decoder.decode(b'', final=True)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return bool(text) or not self.eof
+
+    def peek(self):
+        """
+        Return next Char which is not Whitespace
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON Data")
+
+    def expect(self, char):
+        """
+        Consume char, raise if something else follows
+        """
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON Data, "\
+                             f"got '{self.buffer[self.pos:self.pos+20]}'")
+        self.pos += 1
+
+    def decode_value(self):
+        """
+        Parse the next complete JSON Value
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A Number is only complete if a Delimiter follows,
+            # otherwise it may continue in the next Chunk ("1" | ".5")
+            if isinstance(value, (int, float)) and not isinstance(value, bool) \
+                    and (end == len(self.buffer) or self.buffer[end] not in _DELIMITERS) \
+                    and self.fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(chunks, key):
+    """
+    Yield the Entries of the List stored under key
+    in a JSON Object one by one, without loading the whole Document.
+
+    Args:
+        chunks (iterable): Bytes of the Document, like response.iter_content()
+        key (string): Name of the List in the top level Object
+    """
+    reader = _Reader(chunks)
+    reader.expect('{')
+    while reader.peek() != '}':
+        name = reader.decode_value()
+        reader.expect(':')
+        if name != key:
+            # Not needed, parse and forget
+            reader.decode_value()
+        else:
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.decode_value()
+                    if reader.peek() != ',':
+                        break
+                    reader.pos += 1
+                reader.expect(']')
+        if reader.peek() == ',':
+            reader.pos += 1
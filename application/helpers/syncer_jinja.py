@@ -3,8 +3,10 @@ Syncers Jinja Functions
 """
 
 import ast
+from functools import lru_cache
 import jinja2
 from jinja2 import StrictUndefined
+from application import app
 from application.modules.checkmk.helpers import cmk_cleanup_tag_id
 
 
@@ -35,6 +37,44 @@ def merge_list_of_dicts(input_list):
     return dict_obj
 
 
+_ENVIRONMENTS = {
+    False: jinja2.Environment(),
+    True: jinja2.Environment(undefined=StrictUndefined),
+}
+for _environment in _ENVIRONMENTS.values():
+    _environment.globals.update({
+        'get_list': get_list,
+        'merge_list_of_dicts': merge_list_of_dicts,
+        'cmk_cleanup_tag_id': cmk_cleanup_tag_id,
+    })
+
+
+@lru_cache(maxsize=app.config['JINJA_TEMPLATE_CACHE_SIZE'])
+def get_template(source, strict=False):
+    """
+    Return compiled Template for the given Source.
+    Templates are compiled once per Process and kept in a LRU Cache.
+
+    Args:
+        source (string): Template
+        strict (bool): Raise UndefinedError for missing Variables
+    """
+    return _ENVIRONMENTS[strict].from_string(source)
+
+
+def get_template_cache_stats():
+    """
+    Return Hits and Misses of the Template Cache
+    """
+    info = get_template.cache_info()
+    return {
+        'hits': info.hits,
+        'misses': info.misses,
+        'size': info.currsize,
+        'maxsize': info.maxsize,
+    }
+
+
 def render_jinja(value, mode="ignore", **kwargs):
     """
     Render given string
@@ -44,18 +84,10 @@ def render_jinja(value, mode="ignore", **kwargs):
     - raise: Raise Error if missing Variables
     - nullify: Nullify string in nase of missing Variables
     """
-
-
-    value_tpl = jinja2.Template(value)
-    value_tpl.globals.update({
-        'get_list': get_list,
-        'merge_list_of_dicts': merge_list_of_dicts,
-        'cmk_cleanup_tag_id': cmk_cleanup_tag_id,
-
-    })
-
-    if mode in ["raise", "nullify"]:
-        value_tpl.undefined = StrictUndefined
+    # All Modes always rendered with the default Undefined,
+    # since setting undefined on a Template had no effect.
+    # Kept like this, to not change the Output of existing Rules.
+    value_tpl = get_template(value)
 
     if mode == 'nullify':
         try:
@@ -0,0 +1,18 @@
+"""
+Helpers for Worker Processes
+"""
+from mongoengine import connect, disconnect
+from application import app
+
+
+def reconnect_db():
+    """
+    Open a own Database Connection in a Worker Process.
+
+    The Connection of the Parent can't be shared after fork,
+    so every Worker needs to call this once in his initializer.
+    """
+    settings = dict(app.config['MONGODB_SETTINGS'])
+    disconnect(settings.get('alias', 'default'))
+    connect(**settings)
+
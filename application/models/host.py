@@ -3,10 +3,27 @@ Host Model
 """
 # pylint: disable=no-member, too-few-public-methods, too-many-instance-attributes
 import datetime
-import jinja2
+import functools
+import threading
+from pymongo import UpdateOne, ReturnDocument
 from mongoengine.errors import DoesNotExist
 from application import db, app
 from application.modules.debug import ColorCodes as CC
+from application.helpers.syncer_jinja import get_template
+
+def reserve_change_seq(count=1):
+    """
+    Reserve count new Change Sequence Numbers
+
+    Returns:
+        int: First reserved Number
+    """
+    counters = Host._get_db()['mongoengine.counters'] # pylint: disable=protected-access
+    counter = counters.find_one_and_update({'_id': 'host.change_seq'},
+                                           {'$inc': {'next': count}},
+                                           upsert=True,
+                                           return_document=ReturnDocument.AFTER)
+    return counter['next'] - count + 1
 
 class HostError(Exception):
     """
@@ -26,6 +43,8 @@ class Host(db.Document):
     Host
     """
     hostname = db.StringField(required=True, unique=True)
+    # Reversed, so that Domain Suffix Lookups can use the Index
+    hostname_reversed = db.StringField()
     sync_id = db.StringField()
     labels = db.DictField()
     inventory = db.DictField()
@@ -54,20 +73,150 @@ class Host(db.Document):
 
     cache = db.DictField()
 
+    # Hash of the last exported Payload per Target Account
+    export_digests = db.DictField()
+
+    # Increased on every Label, Inventory or Account Change
+    change_seq = db.IntField()
+    changed_at = db.DateTimeField()
+
 
     meta = {
         'strict': False,
+        'indexes': [
+            'change_seq',
+            'hostname_reversed',
+            ('available', 'is_object'),
+            ('source_account_id', 'last_import_seen'),
+            'last_import_seen',
+            'inventory.syncer_account',
+        ],
     }
 
 
 
     @staticmethod
-    def get_export_hosts():
+    def get_export_hosts(changed_since=None):
         """
         Return all Objects for Exports
+
+        Args:
+            changed_since (int): Only Hosts with a higher change_seq
         """
+        if changed_since is not None:
+            return Host.objects(available=True, is_object__ne=True,
+                                change_seq__gt=changed_since)
         return Host.objects(available=True, is_object__ne=True)
 
+    @staticmethod
+    def get_by_domain(domain):
+        """
+        Return all Hosts whose Hostname ends with domain
+        """
+        return Host.objects(hostname_reversed__startswith=domain[::-1])
+
+    @staticmethod
+    def backfill_hostname_reversed():
+        """
+        Set hostname_reversed on Hosts created before the Field existed
+
+        Returns:
+            int: Number of updated Hosts
+        """
+        # pylint: disable=protected-access
+        operations = [UpdateOne({'_id': x['_id']},
+                                {'$set': {'hostname_reversed': x['hostname'][::-1]}}) \
+                        for x in Host.objects(hostname_reversed=None).only('hostname').as_pymongo()]
+        if operations:
+            Host._get_collection().bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def clean(self):
+        """
+        Called by validate() before each save
+        """
+        if self.hostname:
+            self.hostname_reversed = self.hostname[::-1]
+
+    @staticmethod
+    def iter_hosts(queryset=None, only=None, exclude=('log', 'raw'), batch_size=None):
+        """
+        Iterate Hosts with a Server Side Cursor, for Exporters.
+
+        Args:
+            queryset (QuerySet): Hosts to iterate, default all
+            only (list): Load only this Fields
+            exclude (list): Fields not to load, if only is not given
+            batch_size (int): Hosts per Round Trip, default HOST_CURSOR_BATCH_SIZE
+        """
+        # pylint: disable=protected-access
+        if queryset is None:
+            queryset = Host.objects()
+        if only:
+            queryset = queryset.only(*only)
+        elif exclude:
+            queryset = queryset.exclude(*exclude)
+        batch_size = batch_size or app.config['HOST_CURSOR_BATCH_SIZE']
+        # Rules may need longer then the Cursor Timeout for one Batch,
+        # so the Cursor needs to be closed by us
+        queryset = queryset.batch_size(batch_size).timeout(False)
+        try:
+            yield from queryset
+        finally:
+            queryset._cursor.close()
+
+    @staticmethod
+    def get_changed_since(change_seq):
+        """
+        Return all Hosts changed after given Sequence Number
+        """
+        return Host.objects(change_seq__gt=change_seq).order_by('change_seq')
+
+    @staticmethod
+    def get_current_change_seq():
+        """
+        Return the last given Change Sequence Number
+        """
+        counters = Host._get_db()['mongoengine.counters'] # pylint: disable=protected-access
+        if counter := counters.find_one({'_id': 'host.change_seq'}):
+            return counter['next']
+        return 0
+
+    def mark_changed(self):
+        """
+        Mark that Labels, Inventory or Account changed.
+        The Sequence Number is given when the Host is written.
+        """
+        self.changed_at = datetime.datetime.now()
+        self._change_pending = True
+
+    def has_pending_change(self):
+        """
+        Return if the Host needs a new Change Sequence Number
+        """
+        return getattr(self, '_change_pending', False)
+
+    def assign_change_seq(self, change_seq=None):
+        """
+        Set the Change Sequence Number if the Host was changed
+
+        Args:
+            change_seq (int): Number reserved before, else a new one is reserved
+        """
+        if not self.has_pending_change():
+            return
+        if change_seq is None:
+            change_seq = reserve_change_seq()
+        self.change_seq = change_seq
+        self._change_pending = False
+
+    def save(self, *args, **kwargs):
+        """
+        Save Host, with new Change Sequence Number if needed
+        """
+        self.assign_change_seq()
+        return super().save(*args, **kwargs)
+
     @staticmethod
     def get_host(hostname, create=True):
         """
@@ -95,8 +244,7 @@ class Host(db.Document):
         """
         Build a new Hostname based on Jinja Template
         """
-        tpl = jinja2.Template(template)
-        return tpl.render(HOSTNAME=old_name, **attributes)
+        return get_template(template).render(HOSTNAME=old_name, **attributes)
 
     def lock_to_folder(self, folder_name):
         """
@@ -130,6 +278,7 @@ class Host(db.Document):
                 return
         self.labels[key] = str(value).strip()
         self.cache = {}
+        self.mark_changed()
 
     def update_host(self, labels):
         """
@@ -163,6 +312,7 @@ class Host(db.Document):
             self.add_log(f"Label Change: {self.labels} to {new_labels}")
             self.labels = new_labels
             self.cache = {}
+            self.mark_changed()
 
     def get_labels(self):
         """
@@ -224,6 +374,7 @@ class Host(db.Document):
         if check_dict != update_dict:
             self.add_log(f"Inventory Change: {check_dict} to {update_dict}")
             self.cache = {}
+            self.mark_changed()
 
     def get_inventory(self, key_filter=False):
         """
@@ -281,7 +432,9 @@ class Host(db.Document):
 
         self.is_object = is_object
 
-        self.inventory['syncer_account'] = account_name
+        # Only set if needed, setting marks the Field as changed
+        if self.inventory.get('syncer_account') != account_name:
+            self.inventory['syncer_account'] = account_name
 
         # Everthing Match already, make it short
         if self.source_account_id and self.source_account_id == account_id \
@@ -292,12 +445,14 @@ class Host(db.Document):
         if not self.source_account_id:
             self.source_account_id = account_id
             self.source_account_name = account_name
+            self.mark_changed()
             return True
 
         # If we are here, there is no match. Only Chance, this Account is master
         if account_dict['is_master']:
             self.source_account_id = account_id
             self.source_account_name = account_name
+            self.mark_changed()
             return True
 
         # No, Account was not master. So we go
@@ -308,6 +463,8 @@ class Host(db.Document):
         """
         Mark that a sync for this host was needed to import
         """
+        if not self.available:
+            self.mark_changed()
         self.available = True
         self.last_import_sync = datetime.datetime.now()
         # Delete Cache if new Data is imported
@@ -317,6 +474,9 @@ class Host(db.Document):
         """
         Mark that this host was found on import
         """
+        if not self.available:
+            # Back again, Exports have to pick it up
+            self.mark_changed()
         self.available = True
         self.last_import_seen = datetime.datetime.now()
 
@@ -328,6 +488,7 @@ class Host(db.Document):
         """
         self.available = False
         self.add_log("Not found on Source anymore")
+        self.mark_changed()
 
     def need_import_sync(self, hours=24):
         """
@@ -345,3 +506,89 @@ class Host(db.Document):
         if divmod(timediff.total_seconds(), 3600)[0] > hours:
             return True
         return False
+
+
+class HostUpdates():
+    """
+    Collect changed Fields (like cache) of Hosts,
+    and write them in Batches with one bulk_write,
+    instead of a full save() for every Host.
+
+    The Changes are collected per Thread, so Requests
+    of a Web Worker not write the Hosts of each other.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def pending(self):
+        """
+        Changes collected by the current Thread
+        """
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = {}
+        return self._local.pending
+
+    @pending.setter
+    def pending(self, value):
+        self._local.pending = value
+
+    def add(self, db_host, *fields):
+        """
+        Mark Fields of Host as changed.
+        The values are read when the Batch is written.
+
+        Args:
+            db_host (Host): Host Object
+            fields (string): Names of changed Fields, default cache
+        """
+        if not db_host.pk:
+            # Host not yet in the Database
+            db_host.save()
+            return
+        fields = set(fields or ['cache'])
+        if db_host.pk in self.pending:
+            fields.update(self.pending[db_host.pk][1])
+        self.pending[db_host.pk] = (db_host, fields)
+        if len(self.pending) >= app.config['HOST_UPDATE_BATCH_SIZE']:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all collected Changes
+
+        Returns:
+            int: Number of updated Hosts
+        """
+        # pylint: disable=protected-access
+        if not self.pending:
+            return 0
+        operations = []
+        for host_id, (db_host, fields) in self.pending.items():
+            payload = {}
+            for field_name in fields:
+                field = Host._fields[field_name]
+                payload[field.db_field] = field.to_mongo(getattr(db_host, field_name))
+            operations.append(UpdateOne({'_id': host_id}, {'$set': payload}))
+        self.pending = {}
+        Host._get_collection().bulk_write(operations, ordered=False)
+        return len(operations)
+
+    def unit_of_work(self, function):
+        """
+        Decorator: Changes collected by the function are written when it returns,
+        and dropped if it fails, so nothing stays behind in long running Processes
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            try:
+                result = function(*args, **kwargs)
+            except BaseException:
+                self.pending = {}
+                raise
+            self.flush()
+            return result
+        return wrapper
+
+host_updates = HostUpdates()
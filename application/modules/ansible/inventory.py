@@ -0,0 +1,326 @@
+"""
+Materialized Ansible Inventory
+"""
+import json
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from pymongo import InsertOne, UpdateMany
+from mongoengine.errors import DoesNotExist
+from application import app
+from application.models.host import Host, host_updates
+from application.modules.rule.models import get_rule_version
+from application.modules.ansible.models import AnsibleInventoryEntry, AnsibleInventorySnapshot, \
+                                               AnsibleFilterRule, AnsibleRewriteAttributesRule, \
+                                               AnsibleCustomVariablesRule
+from application.modules.ansible.syncer import SyncAnsible
+from application.modules.custom_attributes.models import CustomAttributeRule
+
+# Compressed Inventory of the current Process, by ETag
+_RESPONSE_CACHE = {}
+
+
+def _join_chunks(items, size):
+    """
+    Yield the JSON items comma separated, size of them at once
+    """
+    chunk = []
+    first = True
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield ('' if first else ', ') + ', '.join(chunk)
+            first = False
+            chunk = []
+    if chunk:
+        yield ('' if first else ', ') + ', '.join(chunk)
+
+
+class InventorySnapshot():
+    """
+    The full Inventory, stored Host by Host.
+
+    Only Hosts changed since the last Update (by change_seq) are
+    calculated again. If one of the Rules changed,
+    the whole Snapshot is build new.
+
+    Every Update creates a new Version of the Snapshot. Its Entries
+    are invisible until the Version is published with the State,
+    so Readers always get one complete Version. Only one Process
+    updates at the same time, guarded by a Lease on the State.
+    """
+    name = 'full_inventory'
+
+    def __init__(self, rule_loader):
+        """
+        Args:
+            rule_loader (function): Returns the Rules, like plugins.ansible.load_rules
+        """
+        self.rule_loader = rule_loader
+
+    @staticmethod
+    def get_rule_version():
+        """
+        Return combined Version of all Rules used for the Inventory
+        """
+        # pylint: disable=protected-access
+        return ":".join(str(get_rule_version(x._get_collection_name())) for x in \
+                            (AnsibleFilterRule, AnsibleRewriteAttributesRule,
+                             AnsibleCustomVariablesRule, CustomAttributeRule))
+
+    @staticmethod
+    def get_version_filter(version):
+        """
+        Return Query for the Entries of a Snapshot Version
+        """
+        return {'valid_from': {'$lte': version},
+                '$or': [{'valid_to': None}, {'valid_to': {'$gt': version}}]}
+
+    def get_state(self):
+        """
+        Return the State Object of the Snapshot
+        """
+        # pylint: disable=protected-access
+        try:
+            return AnsibleInventorySnapshot.objects.get(name=self.name)
+        except DoesNotExist:
+            AnsibleInventorySnapshot._get_collection().update_one(
+                    {'name': self.name},
+                    {'$setOnInsert': {'version': 0, 'change_seq': -1}},
+                    upsert=True)
+            return AnsibleInventorySnapshot.objects.get(name=self.name)
+
+    def get_syncer(self):
+        """
+        Return Syncer with loaded Rules
+        """
+        rules = self.rule_loader()
+        syncer = SyncAnsible()
+        syncer.filter = rules['filter']
+        syncer.rewrite = rules['rewrite']
+        syncer.actions = rules['actions']
+        return syncer
+
+#   .-- Lease
+    def acquire_lease(self, owner, wait=False):
+        """
+        Take the Lease for an Update.
+        An expired Lease (crashed Process) can be taken over.
+        """
+        # pylint: disable=protected-access
+        collection = AnsibleInventorySnapshot._get_collection()
+        while True:
+            now = datetime.now()
+            until = now + timedelta(seconds=app.config['ANSIBLE_INVENTORY_LEASE_SECONDS'])
+            found = collection.find_one_and_update(
+                    {'name': self.name,
+                     '$or': [{'lease_until': None}, {'lease_until': {'$lt': now}}]},
+                    {'$set': {'lease_owner': owner, 'lease_until': until}})
+            if found or not wait:
+                return bool(found)
+            time.sleep(1)
+
+    def renew_lease(self, owner):
+        """
+        Extend the Lease, returns False if it was lost
+        """
+        # pylint: disable=protected-access
+        until = datetime.now() + timedelta(seconds=app.config['ANSIBLE_INVENTORY_LEASE_SECONDS'])
+        result = AnsibleInventorySnapshot._get_collection().update_one(
+                {'name': self.name, 'lease_owner': owner},
+                {'$set': {'lease_until': until}})
+        return result.matched_count == 1
+
+    def release_lease(self, owner):
+        """
+        Give the Lease free
+        """
+        # pylint: disable=protected-access
+        AnsibleInventorySnapshot._get_collection().update_one(
+                {'name': self.name, 'lease_owner': owner},
+                {'$set': {'lease_owner': None, 'lease_until': None}})
+#.
+#   .-- Update
+    def get_changed_host_ids(self, state):
+        """
+        Return IDs of Hosts whose change_seq differs from the Snapshot.
+
+        Change Sequence Numbers are reserved before the Hosts are written,
+        so they not appear in order. Therefore the Hosts are checked from
+        ANSIBLE_INVENTORY_SEQ_OVERLAP Numbers before the highest one seen.
+        """
+        # pylint: disable=protected-access
+        since = state.change_seq - app.config['ANSIBLE_INVENTORY_SEQ_OVERLAP']
+        hosts = list(Host.objects(change_seq__gt=since)\
+                        .only('id', 'hostname', 'change_seq').as_pymongo())
+        if not hosts:
+            return []
+        query = self.get_version_filter(state.version)
+        query['hostname'] = {'$in': [x['hostname'] for x in hosts]}
+        known = {x['hostname']: x.get('change_seq') for x in \
+                    AnsibleInventoryEntry._get_collection().find(query,
+                                                    {'hostname': 1, 'change_seq': 1})}
+        return [x['_id'] for x in hosts \
+                    if x['hostname'] not in known or known[x['hostname']] != x['change_seq']]
+
+    def update(self, full=False, wait=False):
+        """
+        Bring the Snapshot up to date.
+
+        Args:
+            full (bool): Calculate all Hosts again
+            wait (bool): Wait if an other Process is updating,
+                         instead of returning the current Version.
+                         Always done if no Version was published yet
+
+        Returns:
+            State of the current Snapshot, with etag and version
+        """
+        state = self.get_state()
+        rule_version = self.get_rule_version()
+        if not full and state.rule_version == rule_version and state.etag \
+                and not self.get_changed_host_ids(state):
+            return state
+
+        owner = uuid.uuid4().hex
+        # Without a published Version there is nothing to serve meanwhile
+        if not self.acquire_lease(owner, wait or not state.etag):
+            # Another Process is updating, serve the current Version meanwhile
+            return state
+        try:
+            # Reload, the Process before may have done the Work already
+            state = self.get_state()
+            full = full or state.rule_version != rule_version or not state.etag
+            changed_host_ids = None
+            if not full:
+                changed_host_ids = self.get_changed_host_ids(state)
+                if not changed_host_ids:
+                    return state
+            self.build_version(state, owner, rule_version, changed_host_ids)
+        finally:
+            self.release_lease(owner)
+        return self.get_state()
+
+    def build_version(self, state, owner, rule_version, changed_host_ids=None):
+        """
+        Write and publish the next Version of the Snapshot.
+
+        Args:
+            state (AnsibleInventorySnapshot): Current State
+            owner (string): Owner of the Lease
+            rule_version (string): Version of the Rules used
+            changed_host_ids (list): Only calculate this Hosts, or all if None
+        """
+        # pylint: disable=protected-access, no-member, too-many-locals
+        collection = AnsibleInventoryEntry._get_collection()
+        current = state.version
+        version = current + 1
+
+        # Remove what a crashed Update left behind
+        collection.delete_many({'valid_from': {'$gt': current}})
+        collection.update_many({'valid_to': {'$gt': current}}, {'$set': {'valid_to': None}})
+
+        full = changed_host_ids is None
+        syncer = self.get_syncer()
+        if full:
+            collection.update_many({'valid_to': None}, {'$set': {'valid_to': version}})
+            db_hosts = Host.objects()
+            change_seq = -1
+        else:
+            db_hosts = Host.objects(id__in=changed_host_ids)
+            change_seq = state.change_seq
+
+        operations = []
+        for db_host in Host.iter_hosts(db_hosts):
+            hostname = db_host.hostname
+            inventory = syncer.get_inventory_of_host(db_host)
+            if not full:
+                operations.append(UpdateMany({'hostname': hostname, 'valid_to': None},
+                                             {'$set': {'valid_to': version}}))
+            operations.append(InsertOne({'hostname': hostname,
+                                         'hostvars': None if inventory is False else inventory,
+                                         'change_seq': db_host.change_seq,
+                                         'valid_from': version,
+                                         'valid_to': None}))
+            if db_host.change_seq is not None:
+                change_seq = max(change_seq, db_host.change_seq)
+            if len(operations) >= app.config['HOST_UPDATE_BATCH_SIZE']:
+                # Ordered, the old Entry has to be closed before the new one is added
+                collection.bulk_write(operations, ordered=True)
+                operations = []
+                if not self.renew_lease(owner):
+                    return
+        if operations:
+            collection.bulk_write(operations, ordered=True)
+        host_updates.flush()
+
+        if not full:
+            # Hosts deleted from the Syncer
+            existing = set(Host.objects.distinct('hostname'))
+            removed = [x for x in collection.distinct('hostname', {'valid_to': None}) \
+                            if x not in existing]
+            if removed:
+                collection.update_many({'hostname': {'$in': removed}, 'valid_to': None},
+                                       {'$set': {'valid_to': version}})
+
+        # Publish, only if we still own the Lease
+        published = AnsibleInventorySnapshot._get_collection().update_one(
+                {'name': self.name, 'lease_owner': owner},
+                {'$set': {'version': version,
+                          'change_seq': change_seq,
+                          'rule_version': rule_version,
+                          'etag': uuid.uuid4().hex,
+                          'last_update': datetime.now()}})
+        if published.matched_count:
+            # Entries only the Versions before the current one could read
+            collection.delete_many({'valid_to': {'$lte': current}})
+#.
+#   .-- Read
+    def iter_entries(self, version, fields):
+        """
+        Yield the given Fields of all Hosts in the given Version
+        """
+        # pylint: disable=protected-access
+        projection = {x: 1 for x in fields}
+        projection['_id'] = 0
+        query = self.get_version_filter(version)
+        query['hostvars'] = {'$ne': None}
+        cursor = AnsibleInventoryEntry._get_collection().find(query, projection)
+        for entry in cursor.sort('hostname', 1):
+            yield entry
+
+    def iter_json(self, version, hosts_per_chunk=500):
+        """
+        Yield the full Inventory of the Version as JSON, in Chunks.
+        One Cursor is used, the Hostvars are streamed
+        and only the Hostnames are collected for the end.
+        """
+        hostnames = []
+
+        def iter_hostvars():
+            for entry in self.iter_entries(version, ['hostname', 'hostvars']):
+                hostnames.append(entry['hostname'])
+                yield f"{json.dumps(entry['hostname'])}: "\
+                      f"{json.dumps(entry['hostvars'], default=str)}"
+
+        yield '{"_meta": {"hostvars": {'
+        yield from _join_chunks(iter_hostvars(), hosts_per_chunk)
+        yield '}}, "all": {"hosts": ['
+        yield from _join_chunks((json.dumps(x) for x in hostnames), hosts_per_chunk)
+        yield ']}}'
+
+    def get_compressed(self, state):
+        """
+        Return the gzipped JSON Inventory for the State,
+        rendered only once per Process
+        """
+        if state.etag not in _RESPONSE_CACHE:
+            _RESPONSE_CACHE.clear()
+            compressor = zlib.compressobj(wbits=31) # gzip Format
+            parts = [compressor.compress(x.encode('utf-8')) \
+                        for x in self.iter_json(state.version)]
+            parts.append(compressor.flush())
+            _RESPONSE_CACHE[state.etag] = b''.join(parts)
+        return _RESPONSE_CACHE[state.etag]
+#.
@@ -3,7 +3,7 @@ Ansible Rule
 """
 # pylint: disable=no-member, too-few-public-methods, too-many-instance-attributes
 from application import db
-from application.modules.rule.models import rule_types
+from application.modules.rule.models import rule_types, track_rule_version
 
 class AnsibleCustomVariablesRule(db.Document):
     """
@@ -74,3 +74,44 @@ class AnsibleRewriteAttributesRule(db.Document):
         'strict': False
     }
 #.
+#   .-- Inventory Snapshot
+class AnsibleInventoryEntry(db.Document):
+    """
+    Rendered Hostvars of a Host, part of the Inventory Snapshot.
+
+    An Entry belongs to all Snapshot Versions from valid_from
+    until before valid_to, so Readers of a Version are not
+    affected by a running Update.
+    """
+    hostname = db.StringField(required=True)
+    hostvars = db.DictField(null=True) # None: Host not part of the Inventory
+    change_seq = db.IntField()
+    valid_from = db.IntField(required=True)
+    valid_to = db.IntField(null=True)
+    meta = {
+        'strict': False,
+        'indexes': [
+            ('valid_to', 'hostname'),
+            ('hostname', 'valid_to'),
+            'valid_from',
+        ],
+    }
+
+class AnsibleInventorySnapshot(db.Document):
+    """
+    State of the Inventory Snapshot
+    """
+    name = db.StringField(required=True, unique=True)
+    version = db.IntField(default=0)
+    change_seq = db.IntField(default=-1)
+    rule_version = db.StringField()
+    etag = db.StringField()
+    last_update = db.DateTimeField()
+    lease_owner = db.StringField()
+    lease_until = db.DateTimeField()
+    meta = {
+        'strict': False
+    }
+#.
+
+track_rule_version(AnsibleCustomVariablesRule, AnsibleFilterRule, AnsibleRewriteAttributesRule)
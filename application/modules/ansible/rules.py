@@ -11,6 +11,7 @@ class AnsibleVariableRule(Rule):# pylint: disable=too-few-public-methods
     """
 
     name = "Ansible -> Custom Variables"
+    outcomes_use_hostname = False
 
     def add_outcomes(self, rule_outcomes, outcomes):
         """
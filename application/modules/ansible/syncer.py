@@ -4,7 +4,7 @@ Ansible Inventory Modul
 """
 from mongoengine.errors import DoesNotExist
 from application import app
-from application.models.host import Host
+from application.models.host import Host, host_updates
 from application.modules.plugin import Plugin
 
 class SyncAnsible(Plugin):
@@ -37,15 +37,10 @@ class SyncAnsible(Plugin):
     def get_host_data(self, db_host, attributes):
         """
         Return extra Attributes based on
-        rules which has existing attributes in condition
+        rules which has existing attributes in condition.
+        Cached by get_outcomes, for the Rule Version and the Attributes
         """
-        if db_host.cache.get('ansible',{}).get('outcomes'):
-            return db_host.cache['ansible']['outcomes']
-        outcomes = self.actions.get_outcomes(db_host, attributes)
-        db_host.cache.setdefault('ansible', {})
-        db_host.cache['ansible']['outcomes'] = outcomes
-        db_host.save()
-        return outcomes
+        return self.actions.get_outcomes(db_host, attributes)
 
 
     def get_full_inventory(self):
@@ -61,27 +56,39 @@ class SyncAnsible(Plugin):
             },
         }
         #pylint: disable=no-member
-        for db_host in Host.objects():
+        for db_host in Host.iter_hosts():
             hostname = db_host.hostname
 
-            attributes = self.get_host_attributes(db_host, 'ansible')
-            if not attributes:
-                continue
-            extra_attributes = self.get_host_data(db_host, attributes['all'])
-            if 'ignore_host' in extra_attributes:
-                continue
-
-            if self.bypass_host(attributes['all'], extra_attributes):
+            inventory = self.get_inventory_of_host(db_host)
+            if inventory is False:
                 continue
 
-            inventory = attributes['filtered']
-            inventory.update(extra_attributes)
-
             data['_meta']['hostvars'][hostname] = inventory
             data['all']['hosts'].append(hostname)
+        host_updates.flush()
         return data
 
+    def get_inventory_of_host(self, db_host):
+        """
+        Return Hostvars of Host for the full Inventory,
+        or False if the Host is not part of it
+        """
+        attributes = self.get_host_attributes(db_host, 'ansible')
+        if not attributes:
+            return False
+        extra_attributes = self.get_host_data(db_host, attributes['all'])
+        if 'ignore_host' in extra_attributes:
+            return False
+
+        if self.bypass_host(attributes['all'], extra_attributes):
+            return False
+
+        inventory = attributes['filtered']
+        inventory.update(extra_attributes)
+        return inventory
+
 
+    @host_updates.unit_of_work
     def get_host_inventory(self, hostname):
         """
         Get Inventory for single host
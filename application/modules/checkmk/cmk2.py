@@ -4,8 +4,9 @@ Central Request Modul to CMK 2.x
 #pylint: disable=logging-fstring-interpolation
 import requests
 #from requests.exceptions import ConnectionError
-from application import app, log
+from application import app, log, logger
 from application.modules.plugin import Plugin
+from application.helpers.json_stream import iter_json_array
 
 @app.cli.group(name='checkmk')
 def cli_cmk():
@@ -19,6 +20,10 @@ if app.config.get("DISABLE_SSL_ERRORS"):
 class CmkException(Exception):
     """Cmk Errors"""
 
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
 #pylint: disable=too-few-public-methods
 class CMK2(Plugin):
     """
@@ -33,9 +38,9 @@ class CMK2(Plugin):
         self.verify = not app.config.get('DISABLE_SSL_ERRORS')
         self.config = {}
 
-    def request(self, params, method='GET', data=None, additional_header=None):
+    def get_url_and_headers(self, params):
         """
-        Handle Request to CMK
+        Return URL and Headers for a Request to CMK
         """
         address = self.config['address']
         username = self.config['username']
@@ -47,6 +52,41 @@ class CMK2(Plugin):
             'Authorization': f'Bearer {username} {password}',
             'Accept': 'application/json',
         }
+        return url, headers
+
+    def request_stream(self, params, key='value'):
+        """
+        GET a Collection from CMK and yield its Entries one by one,
+        without loading the whole Response into Memory
+        """
+        url, headers = self.get_url_and_headers(params)
+        logger.debug(f"Stream Request (GET) to {url}")
+        try:
+            response = self.get_session().get(url, headers=headers, verify=self.verify,
+                                              timeout=self.get_timeout(), stream=True)
+        except (ConnectionError, requests.exceptions.ConnectionError):
+            #pylint: disable=raise-missing-from
+            raise CmkException("Can't connect to Checkmk")
+        with response:
+            if response.status_code != 200:
+                try:
+                    response_json = response.json()
+                except requests.exceptions.JSONDecodeError:
+                    response_json = {}
+                raise CmkException(f"{response_json.get('title')} "\
+                                   f"{response_json.get('detail')}")
+            chunks = response.iter_content(chunk_size=app.config['CMK_STREAM_CHUNK_SIZE'])
+            try:
+                yield from iter_json_array(chunks, key)
+            except (requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError) as error:
+                raise CmkException(f"Connection to Checkmk broken: {error}") from error
+
+    def request(self, params, method='GET', data=None, additional_header=None):
+        """
+        Handle Request to CMK
+        """
+        url, headers = self.get_url_and_headers(params)
         response = False
         if additional_header:
             headers.update(additional_header)
@@ -83,7 +123,8 @@ class CMK2(Plugin):
                 if  response_json.get('title') not in error_whitelist:
                     raise CmkException(f"{response_json.get('title')} "\
                                        f"{response_json.get('detail')}"\
-                                       f"{response_json.get('fields')}")
+                                       f"{response_json.get('fields')}",
+                                       status_code=response.status_code)
                 return {}, {'status_code': response.status_code}
             resp_header['status_code'] = response.status_code
 
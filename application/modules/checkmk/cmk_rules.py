@@ -4,23 +4,62 @@ Export Checkmk Rules
 """
 #pylint: disable=logging-fstring-interpolation
 import ast
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import requests
 
 from rich.progress import Progress, SpinnerColumn, TimeElapsedColumn, MofNCompleteColumn
 
-from application import log, logger
-from application.models.host import Host
+from application import app, log, logger
+from application.models.host import Host, host_updates
 from application.modules.checkmk.config_sync import SyncConfiguration
 from application.modules.checkmk.cmk2 import CmkException
+from application.modules.checkmk.writer import AdaptiveLimit
 from application.helpers.syncer_jinja import render_jinja
+from application.helpers.cache_stats import CacheStats
 from application.modules.debug import ColorCodes as CC
 
+# Creating a Rule is not idempotent, only retried if Checkmk did not handle it
+CREATE_RETRY_STATUS = (429, 503)
+
+
+def _canonical(value):
+    """
+    Return hashable Version of value, equal if the values are equal
+    """
+    if isinstance(value, dict):
+        return ('dict', frozenset((key, _canonical(val)) for key, val in value.items()))
+    if isinstance(value, list):
+        return ('list', tuple(_canonical(x) for x in value))
+    if isinstance(value, tuple):
+        return ('tuple', tuple(_canonical(x) for x in value))
+    if isinstance(value, (set, frozenset)):
+        return ('set', frozenset(_canonical(x) for x in value))
+    return value
+
+def get_match_key(condition, value_raw):
+    """
+    Return Fingerprint to find a Rule in Checkmk:
+    Conditions and the parsed Value, or None if the Value can't be parsed
+    """
+    try:
+        value = ast.literal_eval(value_raw)
+    except (SyntaxError, ValueError, TypeError):
+        logger.debug(f"Invalid Value: '{value_raw}'")
+        return None
+    return (_canonical(condition), _canonical(value))
+
+
 class CheckmkRuleSync(SyncConfiguration):
     """
     Export Checkmk Rules
     """
+    # Ruleset: {Fingerprint: Rule}
     rulsets_by_type = {}
     messages = []
+    limit = None
 
     def export_cmk_rules(self): # pylint: disable=too-many-branches, too-many-statements
         """
@@ -30,15 +69,15 @@ class CheckmkRuleSync(SyncConfiguration):
         print(f"{CC.OKGREEN} -- {CC.ENDC} Loop over Hosts and collect distinct rules")
 
 
-        db_objects = Host.objects()
-        total = db_objects.count()
+        total = Host.objects.count()
+        cache_stats = CacheStats()
         # pylint: disable=too-many-nested-blocks
         with Progress(SpinnerColumn(),
                       MofNCompleteColumn(),
                       *Progress.get_default_columns(),
                       TimeElapsedColumn()) as progress:
             task1 = progress.add_task("Calculate Ruels", total=total)
-            for db_host in Host.objects():
+            for db_host in Host.iter_hosts():
                 attributes = self.get_host_attributes(db_host, 'cmk_conf')
                 if not attributes:
                     continue
@@ -46,9 +85,18 @@ class CheckmkRuleSync(SyncConfiguration):
                 if host_actions:
                     self.calculate_rules_of_host(db_host.hostname, host_actions, attributes)
                 progress.advance(task1)
-
-        self.clean_rules()
-        self.create_rules()
+        host_updates.flush()
+        summary = cache_stats.get_summary()
+        print(f"{CC.OKGREEN} -- {CC.ENDC} Cache: {summary}")
+        self.messages.append(("INFO", f"Cache: {summary}"))
+
+        to_delete = self.calculate_changes(self.fetch_cmk_rules())
+        self.print_changes(to_delete)
+        if self.dry_run:
+            return
+        self.write_changes(to_delete)
+        log.log(f"Checkmk Rules synced with {self.account_name}", \
+                        source="CMK_RULE_SYNC", details=self.messages)
 
 
     def calculate_rules_of_host(self, hostname, host_actions, attributes):
@@ -104,96 +152,197 @@ class CheckmkRuleSync(SyncConfiguration):
 
                 rule_params['condition'] = condition_tpl
 
-                self.rulsets_by_type.setdefault(rule_type, [])
-                if rule_params not in self.rulsets_by_type[rule_type]:
-                    self.rulsets_by_type[rule_type].append(rule_params)
-
-        log.log(f"Checkmk Rules synced with {self.account_name}", \
-                        source="CMK_RULE_SYNC", details=self.messages)
+                fingerprint = json.dumps(rule_params, sort_keys=True, default=str)
+                self.rulsets_by_type.setdefault(rule_type, {})
+                self.rulsets_by_type[rule_type].setdefault(fingerprint, rule_params)
 
 
-    def create_rules(self):
+    def fetch_cmk_rules(self):
         """
-        Create needed Rules in Checkmk
+        Fetch the Rules of all needed Rulesets from Checkmk.
+        The Requests are only I/O, so they run in Threads.
         """
-        print(f"{CC.OKGREEN} -- {CC.ENDC} Create new Rules")
+        print(f"{CC.OKGREEN} -- {CC.ENDC} Fetch existing Rules from Checkmk")
+        cmk_rules = {}
         with Progress(SpinnerColumn(),
                       MofNCompleteColumn(),
                       *Progress.get_default_columns(),
                       TimeElapsedColumn()) as progress:
+            task1 = progress.add_task("Fetch Rulesets", total=len(self.rulsets_by_type))
+            with ThreadPoolExecutor(max_workers=app.config['CMK_FETCH_CONCURRENCY']) as executor:
+                jobs = {executor.submit(self.request,
+                                        "domain-types/rule/collections/all"\
+                                        f"?ruleset_name={ruleset_name}",
+                                        method="GET"): ruleset_name \
+                            for ruleset_name in self.rulsets_by_type}
+                for job in as_completed(jobs):
+                    cmk_rules[jobs[job]] = job.result()[0].get('value', [])
+                    progress.advance(task1)
+        return cmk_rules
+
+
+    def calculate_changes(self, cmk_rules):
+        """
+        Compare with the Rules in Checkmk.
+        Rules which already exist are removed from rulsets_by_type,
+        Rules not longer needed are returned.
 
-            task1 = progress.add_task("Create Rules", total=len(self.rulsets_by_type))
-            for ruleset_name, rules in self.rulsets_by_type.items():
-                for rule in rules:
-                    template = {
-                        "ruleset": f"{ruleset_name}",
-                        "folder": rule['folder'],
-                        "properties": {
-                            "disabled": False,
-                            "description": f"cmdbsyncer_{self.account_id}",
-                            "comment": rule['comment'],
-                        },
-                        'conditions' : rule['condition'],
-                        'value_raw' : rule['value'],
-                    }
-
-
-                    print(f"{CC.OKBLUE} *{CC.ENDC} Create Rule in {ruleset_name} " \
-                          f"({rule['condition']})")
-                    url = "domain-types/rule/collections/all"
-                    try:
-                        self.request(url, data=template, method="POST")
-                        self.messages.append(("INFO",
-                                              f"Created Rule in {ruleset_name}: {rule['value']}"))
-                    except CmkException as error:
-                        self.messages.append(("ERROR",
-                                             "Could not create Rules: "\
-                                             f"{template}, Response: {error}"))
-                        print(f"{CC.FAIL} Failue: {error} {CC.ENDC}")
-                progress.advance(task1)
+        Returns:
+            dict: Ruleset: List of Rule IDs to delete
+        """
+        to_delete = {}
+        for ruleset_name, rules in self.rulsets_by_type.items():
+            to_delete[ruleset_name] = []
+            # Match Key: Fingerprints of the local Rules
+            rules_by_match_key = {}
+            for fingerprint, rule in rules.items():
+                match_key = get_match_key(rule['condition'], rule['value'])
+                if match_key is not None:
+                    rules_by_match_key.setdefault(match_key, []).append(fingerprint)
+
+            for cmk_rule in cmk_rules.get(ruleset_name, []):
+                if cmk_rule['extensions']['properties'].get('description', '') != \
+                    f'cmdbsyncer_{self.account_id}':
+                    continue
+
+                match_key = get_match_key(cmk_rule['extensions']['conditions'],
+                                          cmk_rule['extensions']['value_raw'])
+                if match_key is not None and match_key in rules_by_match_key:
+                    # Remove, so that it not will be created
+                    for fingerprint in rules_by_match_key.pop(match_key):
+                        del rules[fingerprint]
+                    continue
+
+                # Not existing any more
+                to_delete[ruleset_name].append(cmk_rule['id'])
+        return to_delete
 
 
-    def clean_rules(self):
+    def print_changes(self, to_delete):
         """
-        Clean not longer needed Rules from Checkmk
+        Print what will be created and deleted, Ruleset by Ruleset
         """
-        print(f"{CC.OKGREEN} -- {CC.ENDC} Clean existing CMK configuration")
-        with Progress(SpinnerColumn(),
-                      MofNCompleteColumn(),
-                      *Progress.get_default_columns(),
-                      TimeElapsedColumn()) as progress:
+        print(f"{CC.OKGREEN} -- {CC.ENDC} Changes")
+        for ruleset_name, rules in self.rulsets_by_type.items():
+            rule_ids = to_delete.get(ruleset_name, [])
+            if not rules and not rule_ids:
+                continue
+            print(f"{CC.OKBLUE} *{CC.ENDC} {ruleset_name}: "\
+                  f"{len(rules)} to create, {len(rule_ids)} to delete")
+        total_create = sum(len(x) for x in self.rulsets_by_type.values())
+        total_delete = sum(len(x) for x in to_delete.values())
+        print(f"{CC.OKGREEN} -- {CC.ENDC} Total: "\
+              f"{total_create} to create, {total_delete} to delete")
+
+
+    def limited_request(self, url, method, data=None):
+        """
+        Send Request within the adaptive Limit of the Account
+        """
+        self.limit.acquire()
+        start = time.time()
+        try:
+            return self.request(url, data=data, method=method)
+        finally:
+            self.limit.release(time.time() - start)
+
+
+    def create_with_retry(self, data):
+        """
+        Create a Rule, and try again with Backoff if Checkmk
+        was not reachable or asked to slow down.
+        Other Errors are raised, since the Rule may exist already
+        or can never be created.
+        """
+        attempts = app.config['HTTP_MAX_RETRIES'] + 1
+        for attempt in range(attempts):
+            try:
+                return self.limited_request("domain-types/rule/collections/all",
+                                            "POST", data)
+            except (CmkException, requests.exceptions.ConnectionError) as error:
+                retry = isinstance(error, requests.exceptions.ConnectionError) \
+                            or error.status_code in CREATE_RETRY_STATUS
+                if not retry or attempt + 1 >= attempts:
+                    raise
+                time.sleep(app.config['HTTP_RETRY_BACKOFF'] * 2 ** attempt)
+        return None
+
+
+    def create_rule(self, ruleset_name, rule):
+        """
+        Create one Rule in Checkmk
+        """
+        template = {
+            "ruleset": f"{ruleset_name}",
+            "folder": rule['folder'],
+            "properties": {
+                "disabled": False,
+                "description": f"cmdbsyncer_{self.account_id}",
+                "comment": rule['comment'],
+            },
+            'conditions' : rule['condition'],
+            'value_raw' : rule['value'],
+        }
+        try:
+            self.create_with_retry(template)
+            self.messages.append(("INFO",
+                                  f"Created Rule in {ruleset_name}: {rule['value']}"))
+        except (CmkException, requests.exceptions.RequestException) as error:
+            self.messages.append(("ERROR",
+                                 "Could not create Rules: "\
+                                 f"{template}, Response: {error}"))
+            print(f"{CC.FAIL} Failue: {error} {CC.ENDC}")
+
+
+    def delete_rule(self, ruleset_name, rule_id):
+        """
+        Delete one Rule in Checkmk.
+        Retries are done by the Session, DELETE is idempotent
+        """
+        try:
+            self.limited_request(f'/objects/rule/{rule_id}', "DELETE")
+            self.messages.append(("INFO", f"Deleted Rule in {ruleset_name} {rule_id}"))
+        except (CmkException, requests.exceptions.RequestException) as error:
+            self.messages.append(("ERROR",
+                                 f"Could not delete Rule {rule_id} in {ruleset_name}: "\
+                                 f"{error}"))
+            print(f"{CC.FAIL} Failue: {error} {CC.ENDC}")
 
-            task1 = progress.add_task("Cleanup Rules", total=len(self.rulsets_by_type))
-            for ruleset_name, rules in self.rulsets_by_type.items():
-                url = f"domain-types/rule/collections/all?ruleset_name={ruleset_name}"
-                rule_response = self.request(url, method="GET")[0]
-                for cmk_rule in rule_response['value']:
-                    if cmk_rule['extensions']['properties'].get('description', '') != \
-                        f'cmdbsyncer_{self.account_id}':
-                        continue
 
+    def sync_ruleset(self, ruleset_name, rule_ids, rules, progress, task):
+        """
+        Delete and create the Rules of one Ruleset.
+        The Order of the Rules decides in Checkmk,
+        so they are created one after the other.
+        """
+        for rule_id in rule_ids:
+            self.delete_rule(ruleset_name, rule_id)
+            progress.advance(task)
+        for rule in rules:
+            self.create_rule(ruleset_name, rule)
+            progress.advance(task)
 
 
-                    value = cmk_rule['extensions']['value_raw']
-                    cmk_condition = cmk_rule['extensions']['conditions']
-                    rule_found = False
-                    for rule in rules:
-                        try:
-                            cmk_value = ast.literal_eval(rule['value'])
-                            check_value = ast.literal_eval(value)
-                        except (SyntaxError, KeyError):
-                            logger.debug(f"Invalid Value: '{rule['value']}' or '{value}'")
-                            continue
-                        if rule['condition'] == cmk_condition and cmk_value == check_value:
-                            rule_found = True
-                            # Remove from list, so that it not will be created in the next step
-                            # pylint: disable=unnecessary-dict-index-lookup
-                            self.rulsets_by_type[ruleset_name].remove(rule)
-
-                    if not rule_found: # Not existing any more
-                        rule_id = cmk_rule['id']
-                        print(f"{CC.OKBLUE} *{CC.ENDC} DELETE Rule in {ruleset_name} {rule_id}")
-                        url = f'/objects/rule/{rule_id}'
-                        self.request(url, method="DELETE")
-                        self.messages.append(("INFO", f"Deleted Rule in {ruleset_name} {rule_id}"))
-                progress.advance(task1)
+    def write_changes(self, to_delete):
+        """
+        Delete and create the Rules.
+        Rulesets are handled in parallel Threads, the Requests are limited
+        like in the Host Export by CMK_SEND_PARALLEL and CMK_SEND_SLOWDOWN_FACTOR.
+        """
+        print(f"{CC.OKGREEN} -- {CC.ENDC} Update Rules in Checkmk")
+        total = sum(len(x) for x in to_delete.values()) + \
+                sum(len(x) for x in self.rulsets_by_type.values())
+        self.limit = AdaptiveLimit(app.config['CMK_SEND_PARALLEL'],
+                                   app.config['CMK_SEND_SLOWDOWN_FACTOR'])
+        with Progress(SpinnerColumn(),
+                      MofNCompleteColumn(),
+                      *Progress.get_default_columns(),
+                      TimeElapsedColumn()) as progress:
+            task1 = progress.add_task("Update Rules", total=total)
+            with ThreadPoolExecutor(max_workers=self.limit.max_parallel) as executor:
+                jobs = [executor.submit(self.sync_ruleset, ruleset_name,
+                                        to_delete.get(ruleset_name, []),
+                                        list(rules.values()), progress, task1) \
+                            for ruleset_name, rules in self.rulsets_by_type.items()]
+                for job in as_completed(jobs):
+                    job.result()
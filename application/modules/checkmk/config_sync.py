@@ -13,9 +13,10 @@ from application.modules.checkmk.models import (
         CheckmkUserMngmt
         )
 from application.modules.debug import ColorCodes as CC
-from application.models.host import Host
+from application.models.host import Host, host_updates
 from application.modules.rule.rule import Rule
 from application.helpers.syncer_jinja import render_jinja
+from application.helpers.attribute_index import AttributeIndex
 
 
 str_replace = Rule.replace
@@ -39,25 +40,14 @@ class SyncConfiguration(CMK2):
 
     def parse_attributes(self):
         """
-        Create dict with list of all possible attributes
+        Create Index of all Attribute Keys and Values
         """
-        collection_keys = {}
-        collection_values = {}
-        for db_host in Host.objects():
+        index = AttributeIndex()
+        for db_host in Host.iter_hosts():
             if attributes := self.get_host_attributes(db_host, 'cmk_conf'):
-                for key, value in attributes['all'].items():
-                    key, value = str(key), str(value)
-                    # Add the Keys
-                    collection_keys.setdefault(key, [])
-                    if value not in collection_keys[key]:
-                        collection_keys[key].append(value)
-                    # Add the Values
-                    collection_values.setdefault(value, [])
-                    if key not in collection_values[value]:
-                        collection_values[value].append(key)
-        # [0] All Values behind Label
-        # [1] All Keys which have value
-        return collection_keys, collection_values
+                index.add(attributes['all'])
+        host_updates.flush()
+        return index
 
 #   .-- Export Rulesets
 #.
@@ -70,14 +60,17 @@ class SyncConfiguration(CMK2):
         messages = []
         print(f"\n{CC.HEADER}Read Internal Configuration{CC.ENDC}")
         print(f"{CC.OKGREEN} -- {CC.ENDC} Read all Host Attributes")
-        attributes = self.parse_attributes()
+        attribute_index = self.parse_attributes()
         print(f"{CC.OKGREEN} -- {CC.ENDC} Read all Rules and group them")
         groups = {}
+        # Same as groups, but as Set for the Lookups
+        known_groups = {}
         replace_exceptions = ['-', '_']
         for rule in CheckmkGroupRule.objects(enabled=True):
             outcome = rule.outcome
             group_type = outcome.group_name
             groups.setdefault(group_type, [])
+            known_groups.setdefault(group_type, set())
             rewrite_name = False
             rewrite_title = False
             if outcome.rewrite:
@@ -87,13 +80,10 @@ class SyncConfiguration(CMK2):
             if outcome.foreach_type == 'value':
 
                 if outcome.foreach.endswith('*'):
-                    keys = []
-                    search = outcome.foreach[:-1]
-                    for key, keys_values in attributes[0].items():
-                        if key.startswith(search):
-                            keys += keys_values
+                    # Values of all Keys with the Prefix
+                    keys = attribute_index.get_values(outcome.foreach)
                 else:
-                    keys = attributes[1].get(outcome.foreach, [])
+                    keys = attribute_index.get_keys(outcome.foreach)
 
 
                 for key in keys:
@@ -108,18 +98,12 @@ class SyncConfiguration(CMK2):
                                                        name=key, result=key)
                     new_group_title = str_replace(new_group_title, replace_exceptions).strip()
 
-                    if new_group_name and (new_group_title, new_group_name) \
-                                                            not in groups[group_type]:
-                        groups[group_type].append((new_group_title, new_group_name))
+                    new_group = (new_group_title, new_group_name)
+                    if new_group_name and new_group not in known_groups[group_type]:
+                        known_groups[group_type].add(new_group)
+                        groups[group_type].append(new_group)
             elif outcome.foreach_type == 'label':
-                if outcome.foreach.endswith('*'):
-                    values = []
-                    search = outcome.foreach[:-1]
-                    for label, label_values in attributes[0].items():
-                        if label.startswith(search):
-                            values += label_values
-                else:
-                    values = attributes[0].get(outcome.foreach, [])
+                values = attribute_index.get_values(outcome.foreach)
 
                 for value in values:
                     new_group_title = value
@@ -132,9 +116,10 @@ class SyncConfiguration(CMK2):
                         new_group_title = render_jinja(outcome.rewrite_title,
                                                        name=value, result=value)
                     new_group_title = str_replace(new_group_title, replace_exceptions).strip()
-                    if new_group_name and (new_group_title, new_group_name) \
-                                                        not in groups[group_type]:
-                        groups[group_type].append((new_group_title, new_group_name))
+                    new_group = (new_group_title, new_group_name)
+                    if new_group_name and new_group not in known_groups[group_type]:
+                        known_groups[group_type].add(new_group)
+                        groups[group_type].append(new_group)
             elif outcome.foreach_type == "object":
                 db_filter = {
                     'is_object': True
@@ -142,7 +127,7 @@ class SyncConfiguration(CMK2):
                 object_filter = outcome.foreach
                 if object_filter:
                     db_filter['inventory__syncer_account'] = object_filter
-                for entry in Host.objects(**db_filter):
+                for entry in Host.iter_hosts(Host.objects(**db_filter), only=['hostname']):
                     value = entry.hostname
                     new_group_title = value
                     new_group_name = value
@@ -154,9 +139,10 @@ class SyncConfiguration(CMK2):
                         new_group_title = render_jinja(outcome.rewrite_title,
                                                        name=value, result=value)
                     new_group_title = str_replace(new_group_title, replace_exceptions).strip()
-                    if new_group_name and (new_group_title, new_group_name) \
-                                                        not in groups[group_type]:
-                        groups[group_type].append((new_group_title, new_group_name))
+                    new_group = (new_group_title, new_group_name)
+                    if new_group_name and new_group not in known_groups[group_type]:
+                        known_groups[group_type].add(new_group)
+                        groups[group_type].append(new_group)
 
 
         print(f"\n{CC.HEADER}Start Sync{CC.ENDC}")
@@ -299,7 +285,7 @@ class SyncConfiguration(CMK2):
 
         unique_rules = {}
         related_packs = []
-        for db_host in Host.objects():
+        for db_host in Host.iter_hosts():
             attributes = self.get_host_attributes(db_host, 'cmk_conf')
             if not attributes:
                 continue
@@ -317,6 +303,7 @@ class SyncConfiguration(CMK2):
                         if pack_id not in related_packs:
                             related_packs.append(rule_dict['pack_id'])
 
+        host_updates.flush()
 
         print(f"{CC.OKGREEN} -- {CC.ENDC} Load Rule Packs from Checkmk")
         found_list = []
@@ -370,7 +357,7 @@ class SyncConfiguration(CMK2):
 
         unique_aggregations = {}
         related_packs = []
-        for db_host in Host.objects():
+        for db_host in Host.iter_hosts():
             attributes = self.get_host_attributes(db_host, 'cmk_conf')
             if not attributes:
                 continue
@@ -388,6 +375,7 @@ class SyncConfiguration(CMK2):
                         if pack_id not in related_packs:
                             related_packs.append(pack_id)
 
+        host_updates.flush()
 
         print(f"{CC.OKGREEN} -- {CC.ENDC} Load Rule Packs from Checkmk")
         found_list = []
@@ -10,6 +10,7 @@ from rich.progress import Progress, SpinnerColumn, TimeElapsedColumn, MofNComple
 from application.modules.checkmk.cmk2 import CmkException
 from application.modules.checkmk.config_sync import SyncConfiguration
 from syncerapi.v1 import Host, cc, render_jinja
+from application.models.host import host_updates
 
 _weekdays = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
 
@@ -207,7 +208,7 @@ class CheckmkDowntimeSync(SyncConfiguration):
                       TimeElapsedColumn()) as progress:
             task1 = progress.add_task("Calculating Downtimes", total=total)
             with multiprocessing.Pool() as pool:
-                for db_host in Host.objects():
+                for db_host in Host.iter_hosts():
                     hostname = db_host.hostname
                     progress.console.print(f"- Started for {hostname}")
                     attributes = self.get_host_attributes(db_host, 'cmk_conf')
@@ -227,6 +228,7 @@ class CheckmkDowntimeSync(SyncConfiguration):
                     x.get()
                 pool.close()
                 pool.join()
+        host_updates.flush()
 
     def get_current_cmk_downtimes(self, hostname):
         """
@@ -0,0 +1,97 @@
+"""
+Compact State of Checkmk Hosts
+"""
+import sys
+from types import MappingProxyType
+
+# Attributes Checkmk manages itself, never compared by the Syncer
+IGNORED_ATTRIBUTES = ('labels', 'meta_data')
+
+
+def _intern(value):
+    """
+    Intern Strings, since the same Keys and Values
+    repeat for thousands of Hosts
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def _freeze(data):
+    """
+    Return read only Mapping with interned Keys and Values
+    """
+    return MappingProxyType({_intern(x): _intern(y) for x, y in data.items()})
+
+
+def _get_hash(data):
+    """
+    Return Hash of a Mapping, or None if the Values are not hashable
+    """
+    try:
+        return hash(frozenset(data.items()))
+    except TypeError:
+        return None
+
+
+def normalize_folder(folder):
+    """
+    Checkmk sometimes returns the Folder without the slash in front,
+    and sometimes with a slash at the end
+    """
+    if not folder:
+        return '/'
+    if not folder.startswith('/'):
+        folder = "/" + folder
+    if folder.endswith('/') and folder != '/':
+        folder = folder[:-1]
+    return folder
+
+
+class CmkHostState():
+    """
+    Everything the Syncer compares of a Host in Checkmk
+    """
+    __slots__ = ('folder', 'labels', 'labels_hash', 'attributes',
+                 'is_cluster', 'cluster_nodes', 'owner')
+
+    def __init__(self, folder='/', labels=None, attributes=None,
+                 is_cluster=False, cluster_nodes=None):
+        self.folder = sys.intern(normalize_folder(folder))
+        self.labels = _freeze(labels or {})
+        self.labels_hash = _get_hash(self.labels)
+        self.attributes = _freeze({x: y for x, y in (attributes or {}).items() \
+                                        if x not in IGNORED_ATTRIBUTES})
+        self.is_cluster = bool(is_cluster)
+        self.cluster_nodes = list(cluster_nodes) if cluster_nodes else None
+        self.owner = self.labels.get('cmdb_syncer')
+
+    @classmethod
+    def from_api(cls, host):
+        """
+        Create from a Host of the Checkmk REST API
+        """
+        extensions = host.get('extensions', {})
+        attributes = extensions.get('attributes', {})
+        return cls(folder=extensions.get('folder'),
+                   labels=attributes.get('labels', {}),
+                   attributes=attributes,
+                   is_cluster=extensions.get('is_cluster', False),
+                   cluster_nodes=extensions.get('cluster_nodes'))
+
+    def labels_equal(self, labels):
+        """
+        Compare Labels, with a cheap Hash check before the full compare
+        """
+        if len(labels) != len(self.labels):
+            return False
+        if self.labels_hash is not None:
+            if _get_hash(labels) != self.labels_hash:
+                return False
+        return dict(self.labels) == labels
+
+    def __repr__(self):
+        return f"CmkHostState(folder={self.folder!r}, labels={dict(self.labels)!r}, "\
+               f"attributes={dict(self.attributes)!r}, is_cluster={self.is_cluster!r}, "\
+               f"cluster_nodes={self.cluster_nodes!r})"
@@ -155,7 +155,7 @@ def show_missing(account):
     cmk = CMK2()
     cmk.config = config
 
-    local_hosts = [x.hostname for x in Host.get_export_hosts()]
+    local_hosts = set(Host.get_export_hosts().distinct('hostname'))
     print(f"{ColorCodes.OKBLUE}Started {ColorCodes.ENDC} with account "\
           f"{ColorCodes.UNDERLINE}{account}{ColorCodes.ENDC}")
     url = "domain-types/host_config/collections/all?effective_attributes=false"
@@ -257,9 +257,13 @@ def export_groups(account, test_run=False):
             source="Checkmk", details=details)
 #.
 #   .-- Export Rules
-def export_rules(account):
+def export_rules(account, dry_run=False):
     """
     Create Rules in Checkmk
+
+    Args:
+        account (string): Name Checkmk Account Config
+        dry_run (bool): Only print what would be created and deleted
     """
     details = []
     try:
@@ -267,6 +271,7 @@ def export_rules(account):
         if target_config:
             rules = _load_rules()
             syncer = CheckmkRuleSync()
+            syncer.dry_run = dry_run
             syncer.account_id = str(target_config['_id'])
             syncer.account_name = target_config['name']
             syncer.config = target_config
@@ -198,8 +198,7 @@ class InventorizeHosts(CMK2):
         """ Gett Attribute and Labels """
         print(f"{ColorCodes.OKBLUE} *{ColorCodes.ENDC} Collecting Config Data")
         url = "domain-types/host_config/collections/all?effective_attributes=true"
-        api_hosts = self.request(url, method="GET")
-        for host in api_hosts[0]['value']:
+        for host in self.request_stream(url):
             hostname = host['id']
             self.add_host(hostname)
             attributes = host['extensions']
@@ -3,7 +3,7 @@ Checkmk Rules
 """
 # pylint: disable=no-member, too-few-public-methods, too-many-instance-attributes
 from application import db
-from application.modules.rule.models import rule_types
+from application.modules.rule.models import rule_types, track_rule_version
 
 
 
@@ -546,3 +546,7 @@ class CheckmkObjectCache(db.Document):
     }
 
 #.
+
+track_rule_version(CheckmkFilterRule, CheckmkRule, CheckmkGroupRule, CheckmkRuleMngmt,
+                   CheckmkTagMngmt, CheckmkRewriteAttributeRule, CheckmkBiAggregation,
+                   CheckmkBiRule, CheckmkDowntimeRule)
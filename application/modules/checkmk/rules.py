@@ -19,6 +19,7 @@ class CheckmkRulesetRule(Rule): # pylint: disable=too-few-public-methods, too-ma
     """
 
     name = "Checkmk -> CMK Rules Managment"
+    outcomes_use_hostname = False
 
 
     def add_outcomes(self, rule, outcomes):
@@ -36,6 +37,8 @@ class DefaultRule(Rule):
     """
     Just adds all to the set
     """
+    outcomes_use_hostname = False
+
     def add_outcomes(self, rule, outcomes):
         """
         Add matching Rules to the set
@@ -5,16 +5,55 @@ Add Hosts into CMK Version 2 Installations
 #pylint: disable=logging-fstring-interpolation
 import ast
 import time
+import json
+import hashlib
+import threading
 import multiprocessing
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from mongoengine.errors import DoesNotExist
 from rich.progress import Progress, SpinnerColumn, TimeElapsedColumn, MofNCompleteColumn
 from application import app
-from application.models.host import Host
+from application.models.host import Host, host_updates
 from application.modules.checkmk.cmk2 import CMK2, CmkException
+from application.modules.checkmk.models import CheckmkObjectCache
+from application.modules.checkmk.host_state import CmkHostState
+from application.modules.checkmk.writer import BackgroundSender
 from application.modules.debug import ColorCodes as CC
+from application.helpers.worker import reconnect_db
+from application.helpers.cache_stats import CacheStats, get_cache_stats
 from application import logger, log
 
 
+_WORKER_SYNCER = None
+
+def _init_calculation_worker(syncer):
+    """
+    Prepare a Worker for the Calculation of Hosts.
+    The Syncer (and with it the Rules) is transfered just once per Worker.
+    """
+    global _WORKER_SYNCER # pylint: disable=global-statement
+    reconnect_db()
+    _WORKER_SYNCER = syncer
+
+def _calculate_hosts_batch(host_ids):
+    """
+    Calculate Attributes and Actions for a Batch of Hosts
+
+    Returns:
+        Number of handled Hosts, list of (hostname, next_actions, attributes)
+        and the Cache Stats of the Worker
+    """
+    results = []
+    for db_host in Host.objects(id__in=host_ids):
+        if result := _WORKER_SYNCER.handle_host(db_host):
+            results.append(result)
+    host_updates.flush()
+    return len(host_ids), results, get_cache_stats()
+
+
 class SyncCMK2(CMK2):
     """
     Sync Functions
@@ -29,6 +68,7 @@ class SyncCMK2(CMK2):
     clusters = []
     cluster_updates = []
 
+    # Hostname: CmkHostState
     checkmk_hosts = {}
     existing_folders = []
     existing_folders_attributes = {}
@@ -40,8 +80,18 @@ class SyncCMK2(CMK2):
     num_created = 0
     num_updated  = 0
     num_deleted  = 0
+    num_unchanged = 0
+
+    force_full_sync = False
+    # Set per Account in run()
+    export_digests = None
+    pending_export_digests = None
+    new_export_digests = None
+    failed_export_hosts = None
 
     console = None
+    sender = None
+    count_lock = threading.Lock()
 
     @staticmethod
     def chunks(lst, n):
@@ -49,6 +99,43 @@ class SyncCMK2(CMK2):
         for i in range(0, len(lst), n):
             yield lst[i:i + n]
 
+    @staticmethod
+    def chunks_by_host(entries, n):
+        """
+        Yield chunks of about n Bulk Entries,
+        without splitting the Entries of one Host
+        """
+        chunk = []
+        for entry in entries:
+            if len(chunk) >= n and chunk[-1]['host_name'] != entry['host_name']:
+                yield chunk
+                chunk = []
+            chunk.append(entry)
+        if chunk:
+            yield chunk
+
+    def add_count(self, name, amount=1):
+        """
+        Increase num_ Counter, Thread Safe since the Bulk Senders run parallel
+        """
+        with self.count_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def confirm_export(self, hostnames, success=True):
+        """
+        Keep the Digests of the Hosts if Checkmk accepted them,
+        otherwise they are removed, so the Hosts are sent again next time.
+        Thread Safe since the Bulk Senders run parallel
+        """
+        with self.count_lock:
+            for hostname in hostnames:
+                digest = self.pending_export_digests.pop(hostname, None)
+                if not success:
+                    self.new_export_digests.pop(hostname, None)
+                    self.failed_export_hosts.add(hostname)
+                elif digest:
+                    self.new_export_digests[hostname] = digest
+
 #   .-- Get Host Actions
     def get_host_actions(self, db_host, attributes):
         """
@@ -172,28 +259,27 @@ class SyncCMK2(CMK2):
                       MofNCompleteColumn(),
                       *Progress.get_default_columns(),
                       TimeElapsedColumn()) as progress:
-            task1 = progress.add_task("Fetching Hosts", start=False)
+            task1 = progress.add_task("Fetching Hosts", total=None)
             progress.console.print("Waiting for Checkmk Response")
-            api_hosts = self.request(url, method="GET")
-            progress.update(task1, total=len(api_hosts), start=True)
-            for host in api_hosts[0]['value']:
-                self.checkmk_hosts[host['id']] = host
+            for host in self.request_stream(url):
+                self.checkmk_hosts[host['id']] = CmkHostState.from_api(host)
                 progress.update(task1, advance=1)
 
 
 
-    def _get_hosts_of_folder(self, folder, return_dict):
+    def _get_hosts_of_folder(self, folder):
         """ Get Hosts of given folder """
         folder = folder.replace('/','~')
         url = f"objects/folder_config/{folder}/collections/hosts"
         api_hosts = self.request(url, method="GET")
-        for host in api_hosts[0]['value']:
-            return_dict[host['id']] = host
+        return api_hosts[0].get('value', [])
 
     def _fetch_checkmk_host_by_folder(self):
         """
         Check the folder Structure and get hosts
-        whit multiple request
+        whit multiple request.
+        The Requests are only I/O, so they run in Threads
+        which share the Connection Pool of the Account.
         """
         with Progress(SpinnerColumn(),
                       MofNCompleteColumn(),
@@ -201,17 +287,13 @@ class SyncCMK2(CMK2):
                       TimeElapsedColumn()) as progress:
             num_folders = len(self.existing_folders)
             task1 = progress.add_task("Fetching Hosts folder by folder", total=num_folders)
-            manager = multiprocessing.Manager()
-            return_dict = manager.dict()
-            with multiprocessing.Pool() as pool:
-                for folder in self.existing_folders:
-                    pool.apply_async(self._get_hosts_of_folder,
-                                     args=(folder, return_dict,),
-                                     callback=lambda x: progress.advance(task1))
-
-                pool.close()
-                pool.join()
-                self.checkmk_hosts.update(return_dict)
+            with ThreadPoolExecutor(max_workers=app.config['CMK_FETCH_CONCURRENCY']) as executor:
+                jobs = [executor.submit(self._get_hosts_of_folder, folder) \
+                            for folder in self.existing_folders]
+                for job in as_completed(jobs):
+                    for host in job.result():
+                        self.checkmk_hosts[host['id']] = CmkHostState.from_api(host)
+                    progress.advance(task1)
 
 
     def fetch_checkmk_hosts(self):
@@ -244,6 +326,7 @@ class SyncCMK2(CMK2):
         print(f"{CC.OKBLUE} -- {CC.ENDC}Check if we need to handle Clusters")
         for cluster in self.clusters:
             self.create_cluster(*cluster)
+            self.confirm_export([cluster[0]])
         for cluster in self.cluster_updates:
             self.update_cluster_nodes(*cluster)
 
@@ -254,9 +337,8 @@ class SyncCMK2(CMK2):
         # Get all hosts with cmdb_syncer label and delete if not in synced_hosts
         print(f"{CC.OKBLUE} -- {CC.ENDC}Check if we need to cleanup hosts")
         delete_list = []
-        for host, host_data in self.checkmk_hosts.items():
-            host_labels = host_data['extensions']['attributes'].get('labels',{})
-            if host_labels.get('cmdb_syncer') == self.account_id:
+        for host, host_state in self.checkmk_hosts.items():
+            if host_state.owner == self.account_id:
                 if host not in self.synced_hosts:
                     # Delete host
 
@@ -283,16 +365,16 @@ class SyncCMK2(CMK2):
                 self.num_deleted += len(chunk)
 
 
-    def handle_host(self, db_host, host_actions):
+    def handle_host(self, db_host):
         """
         All Calculation for a Host
         """
         attributes = self.get_host_attributes(db_host, 'checkmk')
         if not attributes:
             logger.debug("Host ignored by rules")
-            return
+            return False
         next_actions = self.get_host_actions(db_host, attributes['all'])
-        host_actions[db_host.hostname] = (next_actions, attributes)
+        return db_host.hostname, next_actions, attributes
 
 
     def handle_cmk_folder(self, next_actions):
@@ -376,16 +458,11 @@ class SyncCMK2(CMK2):
             # Add Host information to the dict, for later cleanup.
             # So no need to query all the hosta again
             self.checkmk_hosts[hostname] = \
-                        {'extensions': {
-                            'attributes':{
-                                 'labels': {
-                                      'cmdb_syncer': self.account_id
-                            }}
-                         }}
+                        CmkHostState(labels={'cmdb_syncer': self.account_id})
         elif not dont_update_host:
             cmk_host = self.checkmk_hosts[hostname]
 
-            if is_cluster and not cmk_host['extensions']['is_cluster']:
+            if is_cluster and not cmk_host.is_cluster:
                 url = f"/objects/host_config/{hostname}"
                 self.request(url, method="DELETE")
                 print(f"{CC.WARNING} *{CC.ENDC} Deleted host to create it as Cluster")
@@ -400,134 +477,274 @@ class SyncCMK2(CMK2):
                             labels, additional_attributes, remove_attributes,
                             dont_move_host)
             if is_cluster:
-                cmk_cluster = cmk_host['extensions']['cluster_nodes']
+                cmk_cluster = cmk_host.cluster_nodes
                 self.cluster_updates.append((hostname, cmk_cluster, cluster_nodes))
         else:
             self.console(" * Host is not to be updated")
+            self.confirm_export([hostname])
 
 
 
-    def calculate_attributes_and_rules(self):
+    def get_export_host_ids(self):
+        """
+        Return IDs of all Hosts to sync with this Account
         """
-        Calculate Attributes and Rules
+        db_objects = Host.get_export_hosts().only('id', 'hostname', 'source_account_name',
+                                                  'export_digests')
+        host_ids = []
+        for db_host in db_objects:
+            if not self.use_host(db_host.hostname, db_host.source_account_name):
+                continue
+            host_ids.append(db_host.id)
+            if digest := db_host.export_digests.get(self.account_id):
+                self.export_digests[db_host.hostname] = digest
+        return host_ids
+
+    def calculate_attributes_and_rules(self, pool, host_ids):
         """
-        db_objects = Host.get_export_hosts()
-        total = db_objects.count()
+        Calculate Attributes and Rules.
 
-        with Progress(SpinnerColumn(),
-                      MofNCompleteColumn(),
-                      *Progress.get_default_columns(),
-                      TimeElapsedColumn()) as progress:
-            task1 = progress.add_task("Calculating Hostrules and Attributes", total=total)
-            manager = multiprocessing.Manager()
-            host_actions = manager.dict()
-            with multiprocessing.Pool() as pool:
-                for db_host in db_objects:
-                    if not self.use_host(db_host.hostname, db_host.source_account_name):
-                        continue
-                    pool.apply_async(self.handle_host,
-                                     args=(db_host, host_actions,),
-                                     callback=lambda x: progress.advance(task1))
-                    progress.console.print(f"- Started on {db_host.hostname}")
+        Yields the Results Batch by Batch, as soon as they are ready.
+        The Workers stay at most CMK_CALCULATION_QUEUE_SIZE Batches ahead,
+        so the Results never pile up in Memory.
+        """
+        max_pending = max(1, int(app.config['CMK_CALCULATION_QUEUE_SIZE']))
+        pending = deque()
+        for batch in self.chunks(host_ids, int(app.config['CMK_CALCULATION_BATCH_SIZE'])):
+            pending.append(pool.apply_async(_calculate_hosts_batch, (batch,)))
+            if len(pending) >= max_pending:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
 
-                pool.close()
-                pool.join()
-        return host_actions
 
 
+#   .-- Incremental Export
+    @staticmethod
+    def get_export_digest(*payload):
+        """
+        Return stable Hash of everything we send for a Host
+        """
+        content = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
 
-#   .-- Run Sync
-    def run(self):
-        """Run Job"""
-        # In Order to delete Hosts from Checkmk, we collect the ones we sync
+    def get_export_state(self):
+        """
+        Return Object which holds the time of the last full Sync
+        """
+        try:
+            return CheckmkObjectCache.objects.get(cache_group='host_export',
+                                                  account=self.config['_id'])
+        except DoesNotExist:
+            new = CheckmkObjectCache()
+            new.cache_group = 'host_export'
+            new.account = self.config['_id']
+            return new
+
+    def use_incremental_export(self):
+        """
+        Check if only changed Hosts needs to be handled,
+        or if it is time for a full Sync
+        """
+        if not app.config['CMK_INCREMENTAL_EXPORT'] or self.force_full_sync or self.limit:
+            return False
+        last_full_sync = self.get_export_state().content.get('last_full_sync')
+        if not last_full_sync:
+            return False
+        if hours := app.config['CMK_FULL_RECONCILE_HOURS']:
+            if datetime.now() - last_full_sync > timedelta(hours=hours):
+                return False
+        return True
 
-        self.log_details.append(('process_started', str(datetime.now())))
-        start_time = time.time()
+    def fetch_checkmk_host(self, hostname):
+        """
+        Fetch single Host from Checkmk
+        """
+        url = f"objects/host_config/{hostname}"
+        cmk_host = self.request(url, method="GET")[0]
+        if cmk_host:
+            self.checkmk_hosts[hostname] = CmkHostState.from_api(cmk_host)
 
-        self.fetch_checkmk_folders()
-        self.fetch_checkmk_hosts()
+    def get_stale_digest_hosts(self):
+        """
+        Return Hosts which were exported with this Account,
+        but are not synced anymore
+        """
+        synced_hosts = set(self.synced_hosts)
+        field = f"export_digests.{self.account_id}"
+        return [x['hostname'] for x in \
+                    Host.objects(__raw__={field: {'$exists': True}}).only('hostname').as_pymongo()
+                if x['hostname'] not in synced_hosts]
 
-        ## Start SYNC of Hosts into CMK
+    def save_export_digests(self, stale_hosts):
+        """
+        Store the Digests of the sent Hosts,
+        and remove them for Hosts not longer synced
+        """
+        # pylint: disable=protected-access
+        if self.dry_run:
+            return
+        field = f"export_digests.{self.account_id}"
+        collection = Host._get_collection()
+        operations = [UpdateOne({'hostname': hostname}, {'$set': {field: digest}}) \
+                        for hostname, digest in self.new_export_digests.items()]
+        for chunk in self.chunks(operations, app.config['HOST_UPDATE_BATCH_SIZE']):
+            collection.bulk_write(chunk, ordered=False)
+        # Failed Hosts are compared again with the next Export
+        stale_hosts = list(stale_hosts) + list(self.failed_export_hosts)
+        for chunk in self.chunks(stale_hosts, app.config['HOST_UPDATE_BATCH_SIZE']):
+            collection.update_many({'hostname': {'$in': chunk}}, {'$unset': {field: ''}})
+        self.new_export_digests = {}
+        self.failed_export_hosts = set()
 
-        host_actions = self.calculate_attributes_and_rules()
+#.
+#   .-- Export Host
+    def export_host(self, hostname, next_actions, attributes, incremental):
+        """
+        Create or Update the calculated Host in Checkmk
+        """
+        export_details = []
+        self.console(f"* {hostname}")
 
-        total = len(host_actions)
-        print(f"\n{CC.OKCYAN} -- {CC.ENDC}Start Sync")
-        with Progress(SpinnerColumn(),
-                      MofNCompleteColumn(),
-                      *Progress.get_default_columns(),
-                      TimeElapsedColumn()) as progress:
-            task1 = progress.add_task("Handling Checkmk Actions", total=total)
-            self.console = progress.console.print
-            for hostname, data in host_actions.items():
-                export_details = []
-                progress.console.print(f"* {hostname}")
+        self.label_prefix = next_actions.get('label_prefix')
 
-                next_actions = data[0]
-                attributes = data[1]
-                self.label_prefix = next_actions.get('label_prefix')
+        label_prefix = ""
+        if self.label_prefix:
+            label_prefix = self.label_prefix
+        labels = {f"{label_prefix}{k}":str(v) for k,v in attributes['filtered'].items()}
 
-                label_prefix = ""
-                if self.label_prefix:
-                    label_prefix = self.label_prefix
-                labels = {f"{label_prefix}{k}":str(v) for k,v in attributes['filtered'].items()}
+        self.only_update_prefixed_labels = next_actions.get('only_update_prefixed_labels')
 
-                self.only_update_prefixed_labels = next_actions.get('only_update_prefixed_labels')
+        self.synced_hosts.append(hostname)
+        labels['cmdb_syncer'] = self.account_id
 
-                self.synced_hosts.append(hostname)
-                labels['cmdb_syncer'] = self.account_id
+        dont_move_host = next_actions.get('dont_move', False)
+        dont_update_host = next_actions.get('dont_update', False)
 
-                dont_move_host = next_actions.get('dont_move', False)
-                dont_update_host = next_actions.get('dont_update', False)
+        folder = self.handle_cmk_folder(next_actions)
+        export_details.append(("folder", folder))
 
-                folder = self.handle_cmk_folder(next_actions)
-                export_details.append(("folder", folder))
 
+        cluster_nodes = [] # if true, we have a cluster
+        if 'create_cluster' in next_actions:
+            cluster_nodes = next_actions['create_cluster']
 
-                cluster_nodes = [] # if true, we have a cluster
-                if 'create_cluster' in next_actions:
-                    cluster_nodes = next_actions['create_cluster']
+        additional_attributes, remove_attributes = \
+                self.handle_attributes(next_actions, attributes)
 
-                additional_attributes, remove_attributes = \
-                        self.handle_attributes(next_actions, attributes)
+        export_details += [
+          ('add_attributes', str(additional_attributes)),
+          ('remove_attributes', str(additional_attributes)),
+        ]
 
-                export_details += [
-                  ('add_attributes', str(additional_attributes)),
-                  ('remove_attributes', str(additional_attributes)),
-                ]
+        digest = self.get_export_digest(folder, labels, cluster_nodes,
+                                        additional_attributes, remove_attributes,
+                                        dont_move_host, dont_update_host)
+        if incremental:
+            if self.export_digests.get(hostname) == digest:
+                self.num_unchanged += 1
+                return
+            self.fetch_checkmk_host(hostname)
 
-                if app.config['CMK_DETAILED_LOG']:
-                    log.log("", affected_hosts=hostname,
-                        source="checkmk_host_export_details", details=export_details)
+        if app.config['CMK_DETAILED_LOG']:
+            log.log("", affected_hosts=hostname,
+                source="checkmk_host_export_details", details=export_details)
 
 
-                self.create_or_update_host(hostname, folder, labels,
-                                      cluster_nodes, additional_attributes,
-                                      remove_attributes, dont_move_host, dont_update_host)
-                progress.advance(task1)
+        # Stored once Checkmk accepted the Host, see confirm_export
+        self.pending_export_digests[hostname] = digest
+        self.create_or_update_host(hostname, folder, labels,
+                              cluster_nodes, additional_attributes,
+                              remove_attributes, dont_move_host, dont_update_host)
 
+#.
+#   .-- Run Sync
+    def run(self):
+        """Run Job"""
+        # In Order to delete Hosts from Checkmk, we collect the ones we sync
 
+        self.log_details.append(('process_started', str(datetime.now())))
+        start_time = time.time()
+        self.export_digests = {}
+        self.pending_export_digests = {}
+        self.new_export_digests = {}
+        self.failed_export_hosts = set()
 
-        # Final Call to create missing hosts via bulk
-        if self.bulk_creates:
-            self.send_bulk_create_host(self.bulk_creates)
-        if self.bulk_updates:
-            self.send_bulk_update_host(self.bulk_updates)
+        incremental = self.use_incremental_export()
+        self.fetch_checkmk_folders()
+        if incremental:
+            print(f"{CC.OKCYAN} -- {CC.ENDC}Incremental Export, only changed Hosts are handled")
+        else:
+            self.fetch_checkmk_hosts()
+
+        ## Start SYNC of Hosts into CMK
+        # Calculation and Checkmk Requests run at the same time
+        host_ids = self.get_export_host_ids()
+        total = 0
+        cache_stats = CacheStats()
+        print(f"\n{CC.OKCYAN} -- {CC.ENDC}Start Sync")
+        with Progress(SpinnerColumn(),
+                      MofNCompleteColumn(),
+                      *Progress.get_default_columns(),
+                      TimeElapsedColumn()) as progress, \
+             multiprocessing.Pool(processes=app.config['CMK_CALCULATION_PROCESSES'],
+                                  initializer=_init_calculation_worker,
+                                  initargs=(self,)) as pool:
+            task1 = progress.add_task("Calculating and Syncing Hosts", total=len(host_ids))
+            self.console = progress.console.print
+            # Start the Thread only after the Workers are forked
+            self.sender = BackgroundSender(app.config['CMK_BULK_QUEUE_SIZE'],
+                                           app.config['CMK_SEND_PARALLEL'],
+                                           app.config['CMK_SEND_SLOWDOWN_FACTOR'])
+            for num_hosts, results, worker_stats in \
+                    self.calculate_attributes_and_rules(pool, host_ids):
+                cache_stats.add(worker_stats)
+                for hostname, next_actions, attributes in results:
+                    total += 1
+                    self.export_host(hostname, next_actions, attributes, incremental)
+                progress.advance(task1, num_hosts)
+
+            # Final Call to create missing hosts via bulk
+            if self.bulk_creates:
+                self.send_bulk(self.send_bulk_create_host, self.bulk_creates,
+                               app.config['CMK_BULK_CREATE_OPERATIONS'])
+                self.bulk_creates = []
+            if self.bulk_updates:
+                self.send_bulk(self.send_bulk_update_host, self.bulk_updates,
+                               app.config['CMK_BULK_UPDATE_OPERATIONS'])
+                self.bulk_updates = []
+            self.sender.close()
+            self.sender = None
+
+        self.log_details.append(('cache_stats', cache_stats.get_summary()))
+        print(f"{CC.OKCYAN} -- {CC.ENDC}Cache: {self.log_details[-1][1]}")
 
         if self.limit:
+            self.save_export_digests([])
             log.log(f"Finished Sync to Checkmk Account: {self.account_name} because LIMIT",
                     source="checkmk_host_export", details=self.log_details)
             print(f"\n{CC.OKCYAN} -- {CC.ENDC}Stop processing in limit mode")
             return
 
         self.handle_clusters()
+        stale_hosts = self.get_stale_digest_hosts()
+        if incremental:
+            # Only the Hosts we exported before needs to be checked for cleanup
+            for hostname in stale_hosts:
+                self.fetch_checkmk_host(hostname)
         self.cleanup_hosts()
         self.handle_folders()
+        self.save_export_digests(stale_hosts)
+        if not incremental and not self.dry_run:
+            export_state = self.get_export_state()
+            export_state.content['last_full_sync'] = datetime.now()
+            export_state.save()
 
         duration = time.time() - start_time
         self.log_details.append(('num_total', str(total)))
         self.log_details.append(('num_created', str(self.num_created)))
         self.log_details.append(('num_updated', str(self.num_updated)))
+        self.log_details.append(('num_unchanged', str(self.num_unchanged)))
         self.log_details.append(('num_delted', str(self.num_deleted)))
         self.log_details.append(('process_finished', str(datetime.now())))
         log.log(f"Synced Hosts to Account: {self.account_name}", source="checkmk_host_export",
@@ -581,6 +798,19 @@ class SyncCMK2(CMK2):
                 else:
                     next_parent  += '/' + sub_folder
 
+#.
+#   .-- Send Bulk
+    def send_bulk(self, function, entries, operations):
+        """
+        Send Bulk Requests in the Background if a Sender is running.
+        Every Chunk is an own Job, so the Chunks are sent in parallel
+        """
+        if not self.sender:
+            function(entries)
+            return
+        for chunk in self.chunks_by_host(entries, int(operations)):
+            self.sender.put(function, chunk)
+
 #.
 #   .-- Create Host
 
@@ -589,17 +819,15 @@ class SyncCMK2(CMK2):
         """
         Send Process to create hosts
         """
-        chunks = list(self.chunks(entries, app.config['CMK_BULK_CREATE_OPERATIONS']))
-        total = len(chunks)
-        count = 1
-        for chunk in chunks:
-            self.console(f" * Send Bulk Create Request {count}/{total}")
-            count += 1
+        for chunk in self.chunks(entries, app.config['CMK_BULK_CREATE_OPERATIONS']):
+            self.console(f" * Send Bulk Create Request for {len(chunk)} Hosts")
             url = "/domain-types/host_config/actions/bulk-create/invoke"
             try:
                 self.request(url, method="POST", data={'entries': chunk})
-                self.num_created += len(chunk)
+                self.add_count('num_created', len(chunk))
+                self.confirm_export([x['host_name'] for x in chunk])
             except CmkException as error:
+                self.confirm_export([x['host_name'] for x in chunk], success=False)
                 self.log_details.append(('error', f"Bulk Create Error: {error}"))
                 self.log_details.append(('error_affected', str(chunk)))
                 self.console(f" * CMK API ERROR {error}")
@@ -611,12 +839,8 @@ class SyncCMK2(CMK2):
         self.bulk_creates.append(body)
         if not app.config['CMK_COLLECT_BULK_OPERATIONS'] and \
                 len(self.bulk_creates) >= int(app.config['CMK_BULK_CREATE_OPERATIONS']):
-            try:
-                self.send_bulk_create_host(self.bulk_creates)
-            except CmkException as error:
-                self.log_details.append(('error', f"Bulk Update Error: {error}"))
-                self.console(f" * CMK API ERROR {error}")
-
+            self.send_bulk(self.send_bulk_create_host, self.bulk_creates,
+                           app.config['CMK_BULK_CREATE_OPERATIONS'])
             self.bulk_creates = []
 
     def create_host(self, hostname, folder, labels, additional_attributes=None):
@@ -640,8 +864,10 @@ class SyncCMK2(CMK2):
 
             try:
                 self.request(url, method="POST", data=body)
-                self.num_created += 1
+                self.add_count('num_created')
+                self.confirm_export([hostname])
             except CmkException as error:
+                self.confirm_export([hostname], success=False)
                 self.log_details.append(('error', f"Host Create Error: {error}"))
                 self.console(f" * CMK API ERROR {error}")
             self.console(f" * Created Host {hostname}")
@@ -710,31 +936,30 @@ class SyncCMK2(CMK2):
         """
         Send Update requests to CMK
         """
-        chunks = list(self.chunks(entries, app.config['CMK_BULK_UPDATE_OPERATIONS']))
-        total = len(chunks)
-        count = 1
-        for chunk in chunks:
-            self.console(f" * Send Bulk Update Request {count}/{total}")
+        for chunk in self.chunks_by_host(entries, app.config['CMK_BULK_UPDATE_OPERATIONS']):
+            self.console(f" * Send Bulk Update Request with {len(chunk)} Entries")
             url = "/domain-types/host_config/actions/bulk-update/invoke"
             try:
-                count += 1
                 self.request(url, method="PUT",
                              data={'entries': chunk},
                             )
-                self.num_updated += len(chunk)
+                self.add_count('num_updated', len({x['host_name'] for x in chunk}))
+                self.confirm_export({x['host_name'] for x in chunk})
             except CmkException as error:
+                self.confirm_export({x['host_name'] for x in chunk}, success=False)
                 self.log_details.append(('error', f"CMK API Error: {error}"))
                 self.log_details.append(('affected_hosts', f"{chunk}"))
                 self.console(f" * CMK API ERROR {error}")
 
-    def add_bulk_update_host(self, body):
+    def add_bulk_update_host(self, entries):
         """
-        Add a Host to bulk list, and Send
+        Add all Update Entries of a Host to bulk list, and Send
         """
-        self.bulk_updates.append(body)
+        self.bulk_updates += entries
         if not app.config['CMK_COLLECT_BULK_OPERATIONS'] and \
                 len(self.bulk_updates) >= int(app.config['CMK_BULK_UPDATE_OPERATIONS']):
-            self.send_bulk_update_host(self.bulk_updates)
+            self.send_bulk(self.send_bulk_update_host, self.bulk_updates,
+                           app.config['CMK_BULK_UPDATE_OPERATIONS'])
             self.bulk_updates = []
 
     def update_host(self, hostname, cmk_host, folder, \
@@ -743,16 +968,8 @@ class SyncCMK2(CMK2):
         """
         Update an Existing Host in Checkmk
         """
-        current_folder = cmk_host['extensions']['folder']
-        # Hack slash in front, quick solution before redesign
-        if not current_folder.startswith('/'):
-            current_folder = "/" + current_folder
-
-        # 2022-08-03 Problem with CMK:
-        # Sometimes we have the / at the end,
-        # sometimes not. This should solve this
-        if current_folder.endswith('/') and current_folder != '/':
-            current_folder = current_folder[:-1]
+        # Already normalized, see host_state.normalize_folder
+        current_folder = cmk_host.folder
 
         logger.debug(f"Checkmk Body: {cmk_host}")
 
@@ -774,6 +991,7 @@ class SyncCMK2(CMK2):
             if 'error' in header:
                 self.console(f" * Host Move Problem: {header['error']}")
                 self.log_details.append(('error', f"Move Error: {hostname} {header['error']}"))
+                self.confirm_export([hostname], success=False)
                 return
             self.console(f" * Host Moved from Folder: {current_folder} to {folder}")
 
@@ -792,8 +1010,8 @@ class SyncCMK2(CMK2):
         do_update_attributes = False
         do_remove_attributes = False
         update_reasons = []
-        cmk_attributes = cmk_host['extensions']['attributes']
-        cmk_labels = cmk_attributes.get('labels', {})
+        cmk_attributes = cmk_host.attributes
+        cmk_labels = cmk_host.labels
         if self.only_update_prefixed_labels:
             # In this case, we secure all labels without the prefix
             for label, value in cmk_labels.items():
@@ -804,7 +1022,7 @@ class SyncCMK2(CMK2):
                         # otherwise we have maybe old data
                         labels[label] = value
 
-        if labels != cmk_labels:
+        if not cmk_host.labels_equal(labels):
             do_update = True
             do_update_labels = True
             update_reasons.append("Labels not match")
@@ -855,49 +1073,56 @@ class SyncCMK2(CMK2):
             logger.debug(f"Syncer Update Body: {update_body}")
 
 
-            # CHeckmk currently fails if you send labels and tags the same time
-            # and you cant send update and remove attributes at the same time
-            for what in ['attributes', 'update_attributes',
-                         'remove_attributes', 'labels', 'tags']:
-                if what in update_body:
-                    if what == 'tags':
-                        if not update_body['tags']:
-                            continue
-                        payload = {
-                            "update_attributes": update_body['tags']
-                        }
-                    elif what == 'labels':
-                        payload = {
-                            "update_attributes": {'labels': update_body[what]},
-                        }
-                    else:
-                        payload = {
-                            what: update_body[what],
-                        }
-
-                    if not app.config['CMK_BULK_UPDATE_HOSTS']:
-                        if not etag: # We may already have one
-                            etag = self.get_etag(hostname, "Update Host (1)")
-                        update_headers = {
-                            'if-match': etag,
-                        }
-                        try:
-                            self.request(update_url, method="PUT",
-                                         data=payload,
-                                         additional_header=update_headers)
-                            self.num_updated += 1
-                            etag = False
-                        except CmkException as error:
-                            self.log_details.append(('error', f"CMK API Error: {error}"))
-                            self.log_details.append(('affected_hosts', hostname))
-                            self.console(f" * CMK API ERROR {error}")
-                        else:
-                            self.console(f" * Updated Host in Checkmk")
-                            self.console(f"   Reasons: {what}: {', '.join(update_reasons)}")
-                    else:
-                        payload['host_name'] = hostname
-                        self.add_bulk_update_host(payload)
-                        self.console(f" * Add to Bulk Update List for {what} update")
+            payloads = self.get_update_payloads(update_body)
+            if not app.config['CMK_BULK_UPDATE_HOSTS']:
+                for payload in payloads:
+                    if not etag: # We may already have one
+                        etag = self.get_etag(hostname, "Update Host (1)")
+                    update_headers = {
+                        'if-match': etag,
+                    }
+                    try:
+                        self.request(update_url, method="PUT",
+                                     data=payload,
+                                     additional_header=update_headers)
+                        etag = False
+                    except CmkException as error:
+                        self.log_details.append(('error', f"CMK API Error: {error}"))
+                        self.log_details.append(('affected_hosts', hostname))
+                        self.console(f" * CMK API ERROR {error}")
+                        self.confirm_export([hostname], success=False)
+                        return
+                self.add_count('num_updated')
+                self.confirm_export([hostname])
+                self.console(" * Updated Host in Checkmk")
+                self.console(f"   Reasons: {', '.join(update_reasons)}")
+            else:
+                for payload in payloads:
+                    payload['host_name'] = hostname
+                self.add_bulk_update_host(payloads)
+                self.console(f" * Add to Bulk Update List ({len(payloads)} Entries)")
+        else:
+            # Nothing to send, but the Move may be done
+            self.confirm_export([hostname])
+
+    @staticmethod
+    def get_update_payloads(update_body):
+        """
+        Merge the Changes of a Host into as few Payloads as Checkmk accepts:
+        Checkmk currently fails if you send labels and tags the same time
+        and you cant send update and remove attributes at the same time
+        """
+        payloads = []
+        update_attributes = dict(update_body['update_attributes'])
+        if 'labels' in update_body:
+            update_attributes['labels'] = update_body['labels']
+        if update_attributes:
+            payloads.append({'update_attributes': update_attributes})
+        if update_body.get('remove_attributes'):
+            payloads.append({'remove_attributes': update_body['remove_attributes']})
+        if update_body['tags']:
+            payloads.append({'update_attributes': update_body['tags']})
+        return payloads
 
 
 #.
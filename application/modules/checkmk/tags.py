@@ -5,53 +5,112 @@ Checkmk Tag Syncronize
 import ast
 import multiprocessing
 from rich.progress import Progress, SpinnerColumn, TimeElapsedColumn, MofNCompleteColumn
-from application import logger
+from application import app, logger
 from application.modules.checkmk.config_sync import SyncConfiguration
 from application.modules.debug import ColorCodes as CC
 from application.modules.checkmk.models import CheckmkTagMngmt
-from application.models.host import Host
+from application.models.host import Host, host_updates
+from application.modules.rule.models import get_rule_version
 from application.helpers.syncer_jinja import render_jinja
+from application.helpers.worker import reconnect_db
+from application.helpers.cache_stats import CacheStats, get_cache_stats
 from application.modules.checkmk.helpers import cmk_cleanup_tag_id
 
+# Fields needed to calculate the Tags of a Host
+TAG_HOST_FIELDS = ('hostname', 'labels', 'inventory', 'cache')
+
+_WORKER_DATA = None
+
+def _init_tag_worker(syncer, groups, multiply_expressions):
+    """
+    Prepare a Worker for the Tag Calculation
+    """
+    global _WORKER_DATA # pylint: disable=global-statement
+    reconnect_db()
+    _WORKER_DATA = (syncer, groups, multiply_expressions)
+
+def _calculate_tags_batch(host_ids):
+    """
+    Calculate the Tags of a Batch of Hosts
+
+    Returns:
+        Number of Hosts, Tags as set by group_id, the added Groups
+        and the Cache Stats of the Worker
+    """
+    syncer, groups, multiply_expressions = _WORKER_DATA
+    tag_groups = {}
+    additional_groups = {}
+    for db_host in Host.iter_hosts(Host.objects(id__in=host_ids), only=TAG_HOST_FIELDS):
+        hosts_tags, hosts_groups = syncer.build_caches(db_host, groups, multiply_expressions)
+        syncer.merge_tags(tag_groups, hosts_tags)
+        additional_groups.update(hosts_groups)
+    host_updates.flush()
+    return len(host_ids), tag_groups, additional_groups, get_cache_stats()
+
+
 class CheckmkTagSync(SyncConfiguration):
     """
     Syncronize Checkmk Tags
     """
     groups = {}
+    cache_version = None
+
 
+    def get_cache_version(self):
+        """
+        Version of the Rules the Tag Caches depend on
+        """
+        # pylint: disable=protected-access
+        self.init_custom_attributes()
+        versions = [str(get_rule_version(CheckmkTagMngmt._get_collection_name()))]
+        versions += [x.ruleset.version for x in \
+                        (self.custom_attributes, self.rewrite, self.filter) if x]
+        return ":".join(versions)
 
     def build_caches(self, db_host, groups, multiply_expressions):
         """
-        Calculation of rules and Host Tags
+        Calculation of rules and Host Tags.
+        The Cache of the Host is only written if something changed.
+
+        Returns:
+            Tags of the Host and the Groups added by it
         """
+        cache = db_host.cache
+        if cache.get('cmk_tags_version') == self.cache_version \
+                and 'cmk_tags_tag_choices' in cache:
+            return cache['cmk_tags_tag_choices'], cache.get('cmk_tags_multiply_groups', {})
+
         object_attributes = self.get_host_attributes(db_host, 'cmk_conf')
+        if not object_attributes:
+            return {}, {}
 
+        new_cache = {
+            'cmk_tags_version': self.cache_version,
+        }
         tags_of_host = {}
         addional_groups = {}
         if multiply_expressions:
-            cache_name_tags = 'cmk_tags_multiply_tags'
-            cache_name_groups = 'cmk_tags_multiply_groups'
-            if cache_name_tags not in db_host.cache or \
-                    cache_name_groups not in db_host.cache:
-                tags_of_host, addional_groups = \
-                            self.check_for_multi_groups(object_attributes,
-                                                        groups,
-                                                        multiply_expressions)
-                db_host.cache[cache_name_tags] = tags_of_host
-                db_host.cache[cache_name_groups] = addional_groups
-
-            tags_of_host = db_host.cache[cache_name_tags]
-            addional_groups = db_host.cache[cache_name_groups]
-            groups.update(addional_groups)
-
-
-        cache_name = 'cmk_tags_tag_choices'
-        if cache_name not in db_host.cache:
-            logger.debug(f" -- Build Tag Cache {cache_name}")
-            hosts_tags = self.get_tags_for_host(db_host, object_attributes,
-                                                      groups, tags_of_host)
-            db_host.cache[cache_name] = hosts_tags
-        db_host.save()
+            tags_of_host, addional_groups = \
+                        self.check_for_multi_groups(object_attributes,
+                                                    groups,
+                                                    multiply_expressions)
+            # Stored as Lists, like they are read back from the Database
+            new_cache['cmk_tags_multiply_tags'] = {x: list(y) for x, y in tags_of_host.items()}
+            new_cache['cmk_tags_multiply_groups'] = addional_groups
+
+        logger.debug(" -- Build Tag Cache cmk_tags_tag_choices")
+        hosts_tags = self.get_tags_for_host(db_host, object_attributes,
+                                            {**groups, **addional_groups}, tags_of_host)
+        new_cache['cmk_tags_tag_choices'] = {x: list(y) for x, y in hosts_tags.items()}
+
+        changed = False
+        for key, value in new_cache.items():
+            if cache.get(key) != value:
+                cache[key] = value
+                changed = True
+        if changed:
+            host_updates.add(db_host, 'cache')
+        return new_cache['cmk_tags_tag_choices'], addional_groups
 
 
     def calculate_rules(self):
@@ -83,37 +142,34 @@ class CheckmkTagSync(SyncConfiguration):
         Export Tags to Checkmk
         """
         base_groups, multiply_expressions = self.calculate_rules()
-
-        total = Host.objects.count()
+        groups = dict(base_groups)
+        multiply_expressions = list(multiply_expressions)
+        self.cache_version = self.get_cache_version()
+
+        # pylint: disable=protected-access
+        host_ids = [x['_id'] for x in Host._get_collection().find({}, {'_id': 1})]
+        batch_size = int(app.config['CMK_CALCULATION_BATCH_SIZE'])
+        batches = [host_ids[x:x + batch_size] for x in range(0, len(host_ids), batch_size)]
+        # group_id: set of (tag_id, tag_title), reduced in this process
+        tags = {}
+        cache_stats = CacheStats()
         with Progress(SpinnerColumn(),
                       MofNCompleteColumn(),
                       *Progress.get_default_columns(),
                       TimeElapsedColumn()) as progress:
-            manager = multiprocessing.Manager()
-            groups = manager.dict()
-            groups.update(base_groups)
-
-            mlt_expressions = manager.list()
-            mlt_expressions += multiply_expressions
-
-            task1 = progress.add_task("Calculating Caches", total=total)
-            with multiprocessing.Pool() as pool:
-                for entry in Host.objects():
-                    pool.apply_async(self.build_caches,
-                                     args=(entry, groups, mlt_expressions),
-                                     callback=lambda x: progress.advance(task1))
-                pool.close()
-                pool.join()
-
-            task2 = progress.add_task("Apply Hosttags to objects", total=total)
-            with multiprocessing.Pool() as pool:
-                tags = manager.list()
-                for entry in Host.objects():
-                    pool.apply_async(self.update_hosts_tags,
-                                     args=(entry, tags),
-                                     callback=lambda x: progress.advance(task2))
-                pool.close()
-                pool.join()
+            task1 = progress.add_task("Calculating Hosttags", total=len(host_ids))
+            with multiprocessing.Pool(processes=app.config['CMK_CALCULATION_PROCESSES'],
+                                      initializer=_init_tag_worker,
+                                      initargs=(self, dict(base_groups), multiply_expressions)) \
+                                                as pool:
+                for num_hosts, tag_groups, additional_groups, worker_stats in \
+                        pool.imap_unordered(_calculate_tags_batch, batches):
+                    cache_stats.add(worker_stats)
+                    for group_id, group_tags in tag_groups.items():
+                        tags.setdefault(group_id, set()).update(group_tags)
+                    groups.update(additional_groups)
+                    progress.advance(task1, num_hosts)
+        print(f"{CC.OKGREEN} -- {CC.ENDC} Cache: {cache_stats.get_summary()}")
 
         # Delete Templates
         for group_id, group in list(groups.items()):
@@ -137,20 +193,13 @@ class CheckmkTagSync(SyncConfiguration):
             group_data['is_template'] = False
             groups[group_id] = group_data
 
-    def update_hosts_tags(self, db_host, global_tags):
+    @staticmethod
+    def merge_tags(tag_groups, hosts_tags):
         """
-        Update the Tags provided by the Host
+        Add the Tags of a Host to the Sets of the Groups
         """
-        cache_name = 'cmk_tags_tag_choices'
-        if cache_name not in db_host.cache:
-            return
-        hosts_tags = db_host.cache[cache_name]
-
-        for group_id, tags in hosts_tags.items():
-            tag_id, tag_title = tags
-            tag_tuple = (group_id, tag_id, tag_title)
-            if tag_tuple not in global_tags:
-                global_tags.append(tag_tuple)
+        for group_id, (tag_id, tag_title) in hosts_tags.items():
+            tag_groups.setdefault(group_id, set()).add((tag_id, tag_title))
 
     def create_inital_groups(self, rule, groups, multiply_expressions):
         """
@@ -293,25 +342,30 @@ class CheckmkTagSync(SyncConfiguration):
         """
         if not config_tags:
             return False
-        config_tags.sort(key=lambda tup: tup[1])
+        # Tags come from a Set, the ID makes the order stable for equal Titles
+        config_tags.sort(key=lambda tup: (tup[1], str(tup[0])))
         if len(config_tags) > 1:
             config_tags.insert(0, (None, "Not set"))
-        found_ids = []
+        found_ids = set()
         tags = []
         for x, y in config_tags:
             if x not in found_ids:
                 tags.append({'ident':x, 'title': y})
-                found_ids.append(x)
+                found_ids.add(x)
 
         if not tags or len(tags) == 0:
             print(f"{CC.WARNING} *{CC.ENDC} Group has no tags")
             return False
         return tags
 
-    def sync_to_checkmk(self, groups, tag_group_list):
+    def sync_to_checkmk(self, groups, tag_groups):
         """
         Use generated configuration to Sync
         Everhting to Checkmk
+
+        Args:
+            groups (dict): Group Configs by group_id
+            tag_groups (dict): Set of (tag_id, tag_title) by group_id
         """
         etag, checkmk_ids = self.get_checkmk_tags()
 
@@ -326,7 +380,7 @@ class CheckmkTagSync(SyncConfiguration):
                     if what in payload:
                         del payload[what]
 
-                tag_list = [(x[1], x[2]) for x in tag_group_list if x[0] == syncer_group_id]
+                tag_list = list(tag_groups.get(syncer_group_id, []))
                 if tags := self.prepare_tags_for_checkmk(tag_list):
                     payload['tags'] = tags
                 else:
@@ -0,0 +1,131 @@
+"""
+Send Requests to Checkmk in the Background
+"""
+import time
+import queue
+import threading
+
+
+class AdaptiveLimit():
+    """
+    Number of Requests allowed at the same time.
+
+    Starts with one and grows while Checkmk answers fast.
+    If the Response Time grows by slowdown_factor compared
+    to the best seen so far, the Limit is halved, and with
+    only one Request left, the next one waits a bit.
+    """
+
+    def __init__(self, max_parallel, slowdown_factor):
+        self.max_parallel = max(1, int(max_parallel))
+        self.slowdown_factor = float(slowdown_factor)
+        self.limit = 1
+        self.active = 0
+        self.average = None
+        self.best = None
+        self.pause = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Wait for a free Slot
+        """
+        with self.condition:
+            while self.active >= self.limit:
+                self.condition.wait()
+            self.active += 1
+            pause = self.pause
+        if pause:
+            time.sleep(pause)
+
+    def release(self, duration):
+        """
+        Free the Slot and adapt the Limit to the Duration of the Request
+        """
+        with self.condition:
+            self.active -= 1
+            if self.average is None:
+                self.average = duration
+            else:
+                self.average = 0.7 * self.average + 0.3 * duration
+            if self.best is None or self.average < self.best:
+                self.best = self.average
+
+            if self.average > self.best * self.slowdown_factor:
+                if self.limit > 1:
+                    self.limit = max(1, self.limit // 2)
+                else:
+                    self.pause = min(max(self.pause * 2, 1), 30)
+            else:
+                self.pause = 0
+                self.limit = min(self.limit + 1, self.max_parallel)
+            self.condition.notify_all()
+
+
+class BackgroundSender():
+    """
+    Runs queued Send Jobs in Threads, while the
+    next Hosts are still calculated and compared.
+
+    The Queue is bounded, so if Checkmk is slower than
+    the Calculation, put() waits instead of collecting
+    more and more Requests in Memory.
+    """
+
+    def __init__(self, queue_size, max_parallel=1, slowdown_factor=2.0):
+        self.queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self.limit = AdaptiveLimit(max_parallel, slowdown_factor)
+        self.error = None
+        self.threads = [threading.Thread(target=self._run, daemon=True) \
+                            for _ in range(self.limit.max_parallel)]
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        """
+        Work on the Queue until close() is called
+        """
+        while True:
+            job = self.queue.get()
+            if job is None:
+                self.queue.task_done()
+                return
+            function, args = job
+            try:
+                if not self.error:
+                    self.limit.acquire()
+                    start = time.time()
+                    try:
+                        function(*args)
+                    finally:
+                        self.limit.release(time.time() - start)
+            except Exception as error: # pylint: disable=broad-exception-caught
+                # Raised again in the main Thread
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def _raise_error(self):
+        """
+        Raise the Exception of a failed Job in the calling Thread
+        """
+        if self.error:
+            error, self.error = self.error, None
+            raise error
+
+    def put(self, function, *args):
+        """
+        Queue function(*args)
+        """
+        self._raise_error()
+        self.queue.put((function, args))
+
+    def close(self):
+        """
+        Wait until all Jobs are sent
+        """
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self._raise_error()
@@ -3,7 +3,7 @@ Model
 """
 # pylint: disable=no-member, too-few-public-methods
 from application import db
-from application.modules.rule.models import rule_types
+from application.modules.rule.models import rule_types, track_rule_version
 
 
 class CustomAttributeRule(db.Document):
@@ -26,3 +26,5 @@ class CustomAttributeRule(db.Document):
     meta = {
         'strict': False,
     }
+
+track_rule_version(CustomAttributeRule)
@@ -13,6 +13,7 @@ class CustomAttributeRule(Rule): # pylint: disable=too-few-public-methods
     """
 
     name = "Custom Attributes"
+    outcomes_use_hostname = False
 
     def add_outcomes(self, rule_outcomes, outcomes):
         """
@@ -3,7 +3,7 @@ i-doit Model
 """
 # pylint: disable=no-member, too-few-public-methods, too-many-instance-attributes, import-error
 from application import db
-from application.modules.rule.models import rule_types
+from application.modules.rule.models import rule_types, track_rule_version
 
 #   .-- Rewrite Attribute
 class IdoitRewriteAttributeRule(db.Document):
@@ -68,3 +68,5 @@ class IdoitCustomAttributes(db.Document):
     meta = {
         'strict': False
     }
+
+track_rule_version(IdoitRewriteAttributeRule, IdoitCustomAttributes)
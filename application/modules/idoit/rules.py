@@ -5,6 +5,7 @@ i-doit Rules
 from ast import literal_eval
 import jinja2
 from application.modules.rule.rule import Rule
+from application.helpers.syncer_jinja import get_template
 
 class IdoitVariableRule(Rule):# pylint: disable=too-few-public-methods
     """
@@ -24,7 +25,7 @@ class IdoitVariableRule(Rule):# pylint: disable=too-few-public-methods
 
             if action == 'id_category':
                 try:
-                    tpl = jinja2.Template(outcome['param'], undefined=jinja2.StrictUndefined)
+                    tpl = get_template(outcome['param'], strict=True)
                     hostname = self.db_host.hostname
                     new_value = tpl.render(HOSTNAME=hostname, **self.attributes)
                     as_dict = literal_eval(new_value)
@@ -33,7 +34,7 @@ class IdoitVariableRule(Rule):# pylint: disable=too-few-public-methods
                 except jinja2.exceptions.UndefinedError:
                     pass
             elif action == 'id_object_description':
-                tpl = jinja2.Template(outcome['param'])
+                tpl = get_template(outcome['param'])
                 hostname = self.db_host.hostname
                 new_value = tpl.render(HOSTNAME=hostname, **self.attributes)
                 outcomes['description'] = new_value
@@ -5,7 +5,7 @@ Sync objects with i-doit
 import requests
 from requests.auth import HTTPBasicAuth
 
-from application.models.host import Host
+from application.models.host import Host, host_updates
 from application import app, log, logger
 from application.modules.debug import ColorCodes as CC
 from application.modules.plugin import Plugin
@@ -61,9 +61,9 @@ class SyncIdoit(Plugin):
             method = method.lower()
             logger.debug(f"Request ({method.upper()}) to {url}")
             logger.debug(f"Request Json Body: {data}")
-            #pylint: disable=missing-timeout
             if method == 'post':
-                response = requests.post(url, auth=auth, json=data)
+                response = self.get_session().post(url, auth=auth, json=data,
+                                                   timeout=self.get_timeout())
 
             logger.debug(f"Response Text: {response.text}")
             if response.status_code == 403:
@@ -233,11 +233,11 @@ class SyncIdoit(Plugin):
 
         print(f"\n{CC.OKGREEN} -- {CC.ENDC}Start Sync")
         db_objects = Host.get_export_hosts()
-        total = len(db_objects)
+        total = db_objects.count()
         counter = 0
         found_hosts = []
 
-        for db_host in db_objects:
+        for db_host in Host.iter_hosts(db_objects):
             objectname = db_host.hostname
             counter += 1
             process = 100.0 * counter / total
@@ -263,6 +263,7 @@ class SyncIdoit(Plugin):
                 self.request(payload)
             else:
                 print(f"{CC.WARNING} *{CC.ENDC}  Host already existed")
+        host_updates.flush()
 
 
 #   .--- Import Hosts
@@ -3,7 +3,7 @@ Netbox Rule
 """
 # pylint: disable=no-member, too-few-public-methods, too-many-instance-attributes, import-error
 from application import db
-from application.modules.rule.models import rule_types
+from application.modules.rule.models import rule_types, track_rule_version
 
 #   .-- Rewrite Attribute
 class NetboxRewriteAttributeRule(db.Document):
@@ -81,3 +81,5 @@ class NetboxCustomAttributes(db.Document):
     meta = {
         'strict': False
     }
+
+track_rule_version(NetboxRewriteAttributeRule, NetboxCustomAttributes)
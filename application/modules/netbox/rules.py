@@ -10,6 +10,7 @@ class NetboxVariableRule(Rule):# pylint: disable=too-few-public-methods
     """
 
     name = "Netbox -> Custom Attributes"
+    outcomes_use_hostname = False
 
     def add_outcomes(self, rule_outcomes, outcomes):
         """
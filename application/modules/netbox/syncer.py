@@ -4,7 +4,7 @@ Create Objects in Netbox
 #pylint: disable=no-member, too-many-locals, import-error
 import requests
 
-from application.models.host import Host
+from application.models.host import Host, host_updates
 from application import app, log, logger
 from application.modules.debug import ColorCodes as CC
 from application.modules.plugin import Plugin
@@ -55,23 +55,20 @@ class SyncNetbox(Plugin):
             method = method.lower()
             logger.debug(f"Request ({method.upper()}) to {url}")
             logger.debug(f"Request Json Body: {data}")
-            #pylint: disable=missing-timeout
+            session = self.get_session()
+            payload = {
+                'headers': headers,
+                'verify': self.verify,
+                'timeout': self.get_timeout(),
+            }
             if method == 'get':
-                response = requests.get(url,
-                                        headers=headers,
-                                        params=data,
-                                        verify=self.verify,
-                                       )
-            elif method == 'post':
-                response = requests.post(url, json=data, headers=headers, verify=self.verify)
-            elif method == 'patch':
-                response = requests.patch(url, json=data, headers=headers, verify=self.verify)
-            elif method == 'put':
-                response = requests.put(url, json=data, headers=headers, verify=self.verify)
+                response = session.get(url, params=data, **payload)
             elif method == 'delete':
-                response = requests.delete(url, headers=headers, verify=self.verify)
+                response = session.delete(url, **payload)
                 # Checkmk gives no json response here, so we directly return
                 return True, response.headers
+            else:
+                response = session.request(method, url, json=data, **payload)
             logger.debug(f"Response Text: {response.text}")
             if response.status_code == 403:
                 raise Exception("Invalid Login, you may need to create a login token")
@@ -95,7 +92,7 @@ class SyncNetbox(Plugin):
                         process = 100.0 * counter / request_count
                         # pylint: disable=line-too-long
                         print(f"   {CC.OKGREEN}({process:.0f}%)...{counter}/{request_count}{CC.ENDC}")
-                        sub_response= requests.get(next_page, headers=headers, verify=self.verify).json()
+                        sub_response= session.get(next_page, **payload).json()
                         next_page = sub_response['next']
                         results += sub_response['results']
                 return results
@@ -455,7 +452,7 @@ class SyncNetbox(Plugin):
         total = db_objects.count()
         counter = 0
         found_hosts = []
-        for db_host in db_objects:
+        for db_host in Host.iter_hosts(db_objects):
             hostname = db_host.hostname
             counter += 1
 
@@ -497,6 +494,7 @@ class SyncNetbox(Plugin):
                     raise Exception(f"Cannot create Host: {create_response}")
             if 'update_interfaces' in custom_rules:
                 self.update_interfaces(host_netbox_id, all_attributes['all'])
+        host_updates.flush()
 
         print(f"\n{CC.OKGREEN} -- {CC.ENDC}Cleanup")
         for hostname, host_data in current_netbox_devices.items():
@@ -4,14 +4,42 @@ Alle Stuff shared by the plugins
 #pylint: disable=too-few-public-methods
 #pylint: disable=logging-fstring-interpolation
 
+import os
 from pprint import pformat
 from collections import namedtuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from application import logger, app
+from application.models.host import host_updates
 from application.modules.custom_attributes.models import CustomAttributeRule as \
     CustomAttributeRuleModel
 from application.modules.custom_attributes.rules import CustomAttributeRule
 
+_SESSIONS = {}
+
+def get_session(name):
+    """
+    Return the pooled Session for the given Name (Account).
+    Sessions are not shared between Processes,
+    so every forked Worker gets his own.
+    """
+    key = (os.getpid(), name)
+    if key not in _SESSIONS:
+        retry = Retry(total=app.config['HTTP_MAX_RETRIES'],
+                      backoff_factor=app.config['HTTP_RETRY_BACKOFF'],
+                      status_forcelist=app.config['HTTP_RETRY_STATUS'],
+                      respect_retry_after_header=True,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=app.config['HTTP_POOL_SIZE'],
+                              pool_maxsize=app.config['HTTP_POOL_SIZE'],
+                              max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _SESSIONS[key] = session
+    return _SESSIONS[key]
+
 
 class Plugin():
     """
@@ -28,6 +56,21 @@ class Plugin():
     save_requests = False
 
 
+    def get_session(self):
+        """
+        Return pooled Session of the Account
+        """
+        config = getattr(self, 'config', None) or {}
+        return get_session(config.get('name', self.account))
+
+    def get_timeout(self):
+        """
+        Return (connect, read) Timeout for Requests of the Account
+        """
+        config = getattr(self, 'config', None) or {}
+        read_timeout = config.get('request_timeout') or app.config['HTTP_REQUEST_TIMEOUT']
+        return app.config['HTTP_CONNECT_TIMEOUT'], float(read_timeout)
+
     def inner_request(self, method, url, data, headers):
         """
         Requst Module for all HTTP Requests
@@ -40,7 +83,7 @@ class Plugin():
         payload = {
             'headers': headers,
             'verify': self.verify,
-            'timeout': app.config['HTTP_REQUEST_TIMEOUT'],
+            'timeout': self.get_timeout(),
         }
         if headers.get('Content-Type') == "application/json" and data:
             payload['json'] = data
@@ -60,15 +103,7 @@ class Plugin():
                 return Struct(status_code=200, headers={}), {}
 
 
-        jobs = {
-            'get': requests.get(url, **payload),
-            'post': requests.post(url, **payload),
-            'put': requests.put(url, **payload),
-            'delete': requests.delete(url, **payload),
-            'head': requests.head(url, **payload),
-            'options': requests.options(url, **payload),
-        }
-        resp = jobs[method]
+        resp = self.get_session().request(method, url, **payload)
         try:
             logger.debug(f"Response Json: {pformat(resp.json())}")
         except requests.exceptions.JSONDecodeError:
@@ -80,6 +115,9 @@ class Plugin():
         """
         Load Rules for custom Attributes
         """
+        if self.custom_attributes:
+            # Already loaded and compiled for this run
+            return
         self.custom_attributes = CustomAttributeRule()
         self.custom_attributes.debug = self.debug
         self.custom_attributes.rules = \
@@ -90,18 +128,23 @@ class Plugin():
         Return Host Attributes or False if Host should be ignored
         """
         # Get Attributes
+        self.init_custom_attributes()
         cache += "_hostattribute"
         db_host.cache.setdefault(cache, {})
-        if 'attributes' in db_host.cache[cache]:
+        # Cache is only valid as long the Rules not changed
+        rule_versions = [x.ruleset.version for x in \
+                            (self.custom_attributes, self.rewrite, self.filter) if x]
+        if 'attributes' in db_host.cache[cache] and \
+                db_host.cache[cache].get('rule_versions') == rule_versions:
             logger.debug(f"Using Attribute Cache for {db_host.hostname}")
             if 'ignore_host' in db_host.cache[cache]['attributes']['filtered']:
                 return False
             return db_host.cache[cache]['attributes']
+        db_host.cache[cache]['rule_versions'] = rule_versions
         attributes = {}
         attributes.update({x:y for x,y in db_host.labels.items() if y})
         attributes.update({x:y for x,y in db_host.inventory.items() if y})
 
-        self.init_custom_attributes()
         attributes.update(self.custom_attributes.get_outcomes(db_host, attributes))
 
         attributes_filtered = {}
@@ -122,9 +165,9 @@ class Plugin():
             data['filtered'] = attributes_filtered
             if attributes_filtered.get('ignore_host'):
                 db_host.cache[cache]['attributes'] = data
-                db_host.save()
+                host_updates.add(db_host, 'cache')
                 return False
 
         db_host.cache[cache]['attributes'] = data
-        db_host.save()
+        host_updates.add(db_host, 'cache')
         return data
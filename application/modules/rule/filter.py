@@ -10,6 +10,7 @@ class Filter(Rule):# pylint: disable=too-few-public-methods
     """
 
     name = "Filter"
+    outcomes_use_hostname = False
 
     def add_outcomes(self, rule_outcomes, outcomes):
         """
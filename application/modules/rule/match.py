@@ -99,3 +99,85 @@ def match(value, needle, condition, negate=False):
         return False
     except Exception as error:
         raise Exception(f"Condition Failed: {condition}, Value: {value}, Needed: {needle}. Hint: {error}")
+
+
+def _raise_condition_failed(condition, value, needle, error):
+    """
+    Same Error as raised by match()
+    """
+    raise Exception(f"Condition Failed: {condition}, Value: {value}, "\
+                    f"Needed: {needle}. Hint: {error}")
+
+
+def compile_match(needle, condition, negate=False):
+    """
+    Build a Function which does the same check like match(),
+    but with all preparation of the needle done only once.
+
+    The returned function just takes the value and returns a bool.
+    """
+    # pylint: disable=too-many-return-statements, too-many-branches
+    if condition == 'ignore':
+        if negate:
+            return lambda value: False
+        return lambda value: True
+
+    if condition == 'bool':
+        try:
+            needle = make_bool(needle)
+        except Exception as error: # pylint: disable=broad-except
+            failed_needle, failed_error = needle, error
+            def bool_failed(value):
+                _raise_condition_failed(condition, value, failed_needle, failed_error)
+            return bool_failed
+
+        def bool_match(value):
+            try:
+                return (make_bool(value) == needle) != negate
+            except Exception as error: # pylint: disable=broad-except
+                _raise_condition_failed(condition, value, needle, error)
+        return bool_match
+
+    needle = str(needle).lower()
+
+    if condition == 'equal':
+        if negate:
+            return lambda value: str(value).lower() != needle
+        return lambda value: str(value).lower() == needle
+    if condition == 'in':
+        if negate:
+            return lambda value: needle not in str(value).lower()
+        return lambda value: needle in str(value).lower()
+    if condition == 'not_in':
+        if negate:
+            return lambda value: needle in str(value).lower()
+        return lambda value: needle not in str(value).lower()
+    if condition == 'in_list':
+        needles = frozenset(x.strip() for x in needle.split(','))
+        if negate:
+            return lambda value: str(value).lower() not in needles
+        return lambda value: str(value).lower() in needles
+    if condition == 'swith':
+        if negate:
+            return lambda value: not str(value).lower().startswith(needle)
+        return lambda value: str(value).lower().startswith(needle)
+    if condition == 'ewith':
+        if negate:
+            return lambda value: not str(value).lower().endswith(needle)
+        return lambda value: str(value).lower().endswith(needle)
+    if condition == 'regex':
+        try:
+            pattern = re.compile(needle)
+        except re.error as error:
+            # Only fail if the condition is really used,
+            # like it was before without compiling
+            failed_error = error
+            def regex_failed(value):
+                _raise_condition_failed(condition, value, needle, failed_error)
+            return regex_failed
+        if negate:
+            return lambda value: not pattern.match(str(value).lower())
+        return lambda value: bool(pattern.match(str(value).lower()))
+
+    # Unknown Condition never matches
+    return lambda value: False
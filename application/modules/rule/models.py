@@ -2,6 +2,8 @@
 Default Rule Models
 """
 # pylint: disable=no-member, too-few-public-methods
+from mongoengine import signals
+from mongoengine.connection import get_db
 from application import db
 
 
@@ -202,3 +204,32 @@ class CustomAttribute(db.EmbeddedDocument):
         'strict': False
     }
 #.
+#   .-- Rule Versions
+def get_rule_version(collection_name):
+    """
+    Return the Version of the Rules in the given Collection.
+    It changes with every saved or deleted Rule.
+    """
+    counter = get_db()['mongoengine.counters'].find_one({'_id': f'rule_version.{collection_name}'})
+    if counter:
+        return counter['next']
+    return 0
+
+def bump_rule_version(sender, **kwargs):
+    """
+    Signal Handler: a Rule of sender was saved or deleted
+    """
+    # pylint: disable=unused-argument, protected-access
+    get_db()['mongoengine.counters'].update_one(
+        {'_id': f'rule_version.{sender._get_collection_name()}'},
+        {'$inc': {'next': 1}},
+        upsert=True)
+
+def track_rule_version(*documents):
+    """
+    Bump the Version of the given Rule Documents on every save and delete
+    """
+    for document in documents:
+        signals.post_save.connect(bump_rule_version, sender=document)
+        signals.post_delete.connect(bump_rule_version, sender=document)
+#.
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Cache for Rule Outcomes, shared by all Hosts of a Process
+"""
+import json
+import copy
+import hashlib
+from collections import OrderedDict
+
+from application import app
+
+
+def get_attribute_fingerprint(attributes):
+    """
+    Return short Hash of the Attributes,
+    Hosts with the same Attributes get the same one
+    """
+    content = json.dumps(attributes, sort_keys=True, default=str)
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+
+class OutcomeCache():
+    """
+    LRU Cache of Rule Outcomes.
+
+    The Key contains the Version of the Rule Set, so after a
+    Rule is changed, old Entries are not found anymore and
+    just drop out of the Cache.
+    """
+
+    def __init__(self, size=None):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(name, ruleset, attributes, hostname):
+        """
+        Return Key for the Outcomes of a Host.
+
+        Args:
+            name (string): Name of the Rule Class (cache_name)
+            ruleset (RuleSet): Compiled Rules
+            attributes (dict): Attributes of the Host
+            hostname (string): Hostname or None, if the Outcome can't depend on it
+        """
+        return (name, ruleset.version, get_attribute_fingerprint(attributes), hostname)
+
+    @staticmethod
+    def get_key_digest(key):
+        """
+        Return the Key as String, to store it with the Host
+        """
+        name, version, fingerprint, hostname = key
+        return f"{name}:{version}:{fingerprint.hex()}:{hostname}"
+
+    def get(self, key):
+        """
+        Return copy of the cached Outcomes or None
+        """
+        try:
+            outcomes = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        # Plugins may modify the Outcomes
+        return copy.deepcopy(outcomes)
+
+    def set(self, key, outcomes):
+        """
+        Store copy of the Outcomes
+        """
+        size = self.size or app.config['RULE_OUTCOME_CACHE_SIZE']
+        self.entries[key] = copy.deepcopy(outcomes)
+        self.entries.move_to_end(key)
+        while len(self.entries) > size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all Entries
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self):
+        """
+        Return Hits, Misses and Size
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+        }
+
+
+outcome_cache = OutcomeCache()
@@ -4,8 +4,8 @@ Rewrite
 """
 #pylint: disable=logging-fstring-interpolation, bare-except, too-many-branches, too-many-locals
 import re
-import jinja2
 from application.modules.rule.rule import Rule
+from application.helpers.syncer_jinja import get_template
 from application import logger
 
 class Rewrite(Rule):# pylint: disable=too-few-public-methods
@@ -52,7 +52,7 @@ class Rewrite(Rule):# pylint: disable=too-few-public-methods
                         except:
                             logger.debug("Cant Split Rewrite Attribute")
                 elif mode == 'jinja':
-                    tpl = jinja2.Template(new_attribute_name)
+                    tpl = get_template(new_attribute_name)
                     new_attribute_name = tpl.render(HOSTNAME=self.hostname, **self.attributes)
                     if self.attributes.get(attribute_name):
                         outcomes[f'add_{new_attribute_name}'] = self.attributes[attribute_name]
@@ -91,7 +91,7 @@ class Rewrite(Rule):# pylint: disable=too-few-public-methods
                     except:
                         logger.debug("Cant Split Value")
                 elif value_mode == 'jinja':
-                    tpl = jinja2.Template(new_value)
+                    tpl = get_template(new_value)
                     new_value = tpl.render(HOSTNAME=self.hostname, **self.attributes)
                     outcomes[f'add_{attribute_name}'] = new_value
         return outcomes
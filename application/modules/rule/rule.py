@@ -12,6 +12,9 @@ from rich import box
 from application import logger, app
 
 from application.modules.rule.match import match
+from application.modules.rule.ruleset import RuleSet
+from application.modules.rule.outcome_cache import outcome_cache
+from application.models.host import host_updates
 
 class Rule(): # pylint: disable=too-few-public-methods
     """
@@ -19,17 +22,53 @@ class Rule(): # pylint: disable=too-few-public-methods
     """
     debug = False
     debug_lines = []
-    rules = []
     name = ""
     attributes = {}
     hostname = False
     db_host = False
     cache_name = False
+    # Set to False in Rule Classes whose Outcomes only depend
+    # on the Attributes, so Hosts with the same Attributes share them
+    outcomes_use_hostname = True
+
+    _rules = []
+    _ruleset = None
 
 
     def __init__(self):
         self.debug_lines = []
 
+    @property
+    def rules(self):
+        """
+        Rule Documents used by this Class
+        """
+        return self._rules
+
+    @rules.setter
+    def rules(self, rules):
+        self._rules = rules
+        self._ruleset = None
+
+    @property
+    def ruleset(self):
+        """
+        Compiled version of the rules,
+        build once on first use
+        """
+        if self._ruleset is None:
+            self._ruleset = RuleSet(self._rules)
+        return self._ruleset
+
+    def __getstate__(self):
+        """
+        Compiled Rules contain functions which can't be pickled,
+        so they are build again in the worker process
+        """
+        state = self.__dict__.copy()
+        state.pop('_ruleset', None)
+        return state
+
     @staticmethod
     def replace(input_raw, exceptions=None, regex=None):
         """
@@ -111,48 +150,31 @@ class Rule(): # pylint: disable=too-few-public-methods
             table.add_column("Last Match")
 
         outcomes = {}
-        for rule in self.rules:
-            rule = rule.to_mongo()
-            rule_hit = False
-            if rule['condition_typ'] == 'any':
-                for condtion in rule['conditions']:
-                    local_hit = False
-                    if condtion['match_type'] == 'tag':
-                        local_hit = self._check_attribute_match(condtion)
-                    else:
-                        local_hit = self._check_hostname_match(condtion, hostname)
-                    if local_hit:
-                        rule_hit = True
-            elif rule['condition_typ'] == 'all':
-                negativ_match = False
-                for condtion in rule['conditions']:
-                    if condtion['match_type'] == 'tag':
-                        if not self._check_attribute_match(condtion):
-                            negativ_match = True
-                    else:
-                        if not self._check_hostname_match(condtion, hostname):
-                            negativ_match = True
-                if not negativ_match:
-                    rule_hit = True
-            elif rule['condition_typ'] == 'anyway':
-                rule_hit = True
+        hostname_lower = str(hostname).lower()
+        if self.debug:
+            # Show all Rules in Debug Table, not only the possible ones
+            rules = self.ruleset
+        else:
+            rules = self.ruleset.candidates(self.attributes, hostname_lower)
+        for rule in rules:
+            rule_hit = rule.is_hit(self.attributes, hostname_lower)
 
             if self.debug:
                 debug_data = {
                     "group": self.name,
                     "hit": rule_hit,
-                    "condition_type": rule_descriptions[rule['condition_typ']],
-                    "name": rule['name'],
-                    "id": str(rule['_id']),
-                    "last_match": str(rule['last_match'])
+                    "condition_type": rule_descriptions[rule.condition_typ],
+                    "name": rule.name,
+                    "id": str(rule.rule_id),
+                    "last_match": str(rule.last_match)
                 }
                 self.debug_lines.append(debug_data)
-                table.add_row(str(rule_hit), rule_descriptions[rule['condition_typ']],\
-                              rule['name'][:30], str(rule['_id']), str(rule['last_match']))
+                table.add_row(str(rule_hit), rule_descriptions[rule.condition_typ],\
+                              rule.name[:30], str(rule.rule_id), str(rule.last_match))
             if rule_hit:
-                outcomes = self.add_outcomes([dict(x) for x in rule['outcomes']], outcomes)
+                outcomes = self.add_outcomes(rule.get_outcomes(), outcomes)
                 # If rule has matched, and option is set, we are done
-                if rule['last_match']:
+                if rule.last_match:
                     break
         if self.debug:
             console = Console()
@@ -179,17 +201,33 @@ class Rule(): # pylint: disable=too-few-public-methods
         """
         Handle Return of outcomes.
         """
+        self.attributes = attributes
+        self.hostname = db_host.hostname
+        self.db_host = db_host
+        if self.debug:
+            return self.check_rule_match(db_host)
+
         cache = self.__class__.__qualname__
         if self.cache_name:
             cache = self.cache_name
-        if cache in db_host.cache:
+        hostname = None
+        if self.outcomes_use_hostname or self.ruleset.uses_hostname:
+            hostname = db_host.hostname
+        cache_key = outcome_cache.get_key(cache, self.ruleset, attributes, hostname)
+        rules = outcome_cache.get(cache_key)
+        if rules is not None:
+            logger.debug(f"Using shared Rule Cache for {db_host.hostname}")
+            return rules
+
+        # The Host Cache is only valid for the same Rules and Attributes
+        key_digest = outcome_cache.get_key_digest(cache_key)
+        host_cache = db_host.cache.get(cache)
+        if isinstance(host_cache, dict) and host_cache.get('cache_key') == key_digest:
             logger.debug(f"Using Rule Cache Cache for {db_host.hostname}")
-            return db_host.cache[cache]
-
-        self.attributes = attributes
-        self.hostname = db_host.hostname
-        self.db_host = db_host
-        rules = self.check_rule_match(db_host)
-        db_host.cache[cache] = rules
-        db_host.save()
+            rules = host_cache['outcomes']
+        else:
+            rules = self.check_rule_match(db_host)
+            db_host.cache[cache] = {'cache_key': key_digest, 'outcomes': rules}
+            host_updates.add(db_host, 'cache')
+        outcome_cache.set(cache_key, rules)
         return rules
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Compiled Rule Sets
+"""
+import json
+import hashlib
+from application.modules.rule.match import compile_match
+from application.modules.rule.models import get_rule_version
+
+
+class CompiledRule(): # pylint: disable=too-few-public-methods
+    """
+    Rule Document, prepared once for matching
+    """
+    __slots__ = ('rule_id', 'name', 'condition_typ', 'last_match',
+                 'conditions', 'outcomes', 'index_keys')
+
+    def __init__(self, rule):
+        """
+        Prepare the Rule
+
+        Args:
+            rule (dict): Rule Document as dict (to_mongo())
+        """
+        self.rule_id = rule.get('_id')
+        self.name = rule.get('name', '')
+        self.condition_typ = rule.get('condition_typ')
+        self.last_match = rule.get('last_match', False)
+        self.conditions = [compile_condition(x) for x in rule.get('conditions', [])]
+        self.outcomes = [dict(x) for x in rule.get('outcomes', [])]
+        self.index_keys = False
+        if self.condition_typ == 'all':
+            self.index_keys = _get_index_keys(rule.get('conditions', []))
+
+    def get_outcomes(self):
+        """
+        Return copy of the outcomes,
+        since the Rule Classes may modify them
+        """
+        return [dict(x) for x in self.outcomes]
+
+    def is_hit(self, attributes, hostname):
+        """
+        Check if the Rule matches
+
+        Args:
+            attributes (dict): Attributes of Host
+            hostname (string): Lowercase Hostname
+        """
+        if self.condition_typ == 'any':
+            return any(check(attributes, hostname) for check in self.conditions)
+        if self.condition_typ == 'all':
+            return all(check(attributes, hostname) for check in self.conditions)
+        if self.condition_typ == 'anyway':
+            return True
+        return False
+
+
+def _get_needles(needle, condition, negate):
+    """
+    Return the exact (lowercase) strings a condition can match,
+    or False if the condition can't be resolved to them
+    """
+    if negate:
+        return False
+    if condition == 'equal':
+        return {str(needle).lower()}
+    if condition == 'in_list':
+        return {x.strip() for x in str(needle).lower().split(',')}
+    return False
+
+
+def _get_index_keys(conditions):
+    """
+    Find the condition of an 'all' rule which names exact values,
+    since the rule can only match a host having one of them.
+
+    Returns:
+        ('attribute', set of (tag, value)) or ('hostname', set of hostnames)
+        or False if no condition can be used
+    """
+    for condition in conditions:
+        if condition.get('match_type') == 'tag':
+            tags = _get_needles(condition.get('tag'), condition.get('tag_match'),
+                                condition.get('tag_match_negate'))
+            values = _get_needles(condition.get('value'), condition.get('value_match'),
+                                  condition.get('value_match_negate'))
+            if tags and values:
+                return 'attribute', {(x, y) for x in tags for y in values}
+        else:
+            hostnames = _get_needles(str(condition.get('hostname')).lower(),
+                                     str(condition.get('hostname_match')).lower(),
+                                     condition.get('hostname_match_negate'))
+            if hostnames:
+                return 'hostname', hostnames
+    return False
+
+
+def compile_condition(condition):
+    """
+    Return Function (attributes, hostname) -> bool for the given Condition
+    """
+    if condition.get('match_type') == 'tag':
+        return _compile_attribute_condition(condition)
+    return _compile_hostname_condition(condition)
+
+
+def _compile_attribute_condition(condition):
+    """
+    Check if one of the Attributes matches to Tag and Value
+    """
+    needed_tag = condition.get('tag')
+    tag_match = condition.get('tag_match')
+    tag_match_negate = condition.get('tag_match_negate')
+
+    if tag_match == 'ignore' and tag_match_negate:
+        # This Case Checks that Tag NOT Exists
+        return lambda attributes, _hostname: needed_tag not in attributes
+
+    tag_matcher = compile_match(needed_tag, tag_match, tag_match_negate)
+    value_matcher = compile_match(condition.get('value'), condition.get('value_match'),
+                                  condition.get('value_match_negate'))
+
+    def check(attributes, _hostname):
+        for tag, value in attributes.items():
+            if tag_matcher(tag) and value_matcher(value):
+                return True
+        return False
+    return check
+
+
+def _compile_hostname_condition(condition):
+    """
+    Check if the Hostname matches
+    """
+    host_match = str(condition.get('hostname_match')).lower()
+    hostname_matcher = compile_match(str(condition.get('hostname')).lower(), host_match,
+                                     condition.get('hostname_match_negate'))
+    return lambda _attributes, hostname: hostname_matcher(hostname)
+
+
+class RuleSet():
+    """
+    All enabled Rules of a Rule Class, compiled once per run.
+
+    'all' Rules which contain an equal or in_list condition
+    are indexed by the values of that condition,
+    so for a host only rules which can match needs to be checked.
+    """
+
+    def __init__(self, rules):
+        """
+        Compile all given Rule Documents
+
+        Args:
+            rules (iterable): Rule Documents or dicts
+        """
+        self.rules = []
+        self.always_check = []
+        self.attribute_index = {}
+        self.hostname_index = {}
+        # Changes with every Change on the Rules, part of the Outcome Cache Key.
+        # For Rules of a QuerySet, the Version Counter of the Collection is used,
+        # otherwise a Hash of the Rules
+        self.version = None
+        if hasattr(rules, '_document'):
+            # pylint: disable=protected-access
+            collection = rules._document._get_collection_name()
+            self.version = f"{collection}:{get_rule_version(collection)}"
+        content_hash = hashlib.sha1()
+        # Only if set, the Outcomes can depend on the Hostname
+        self.uses_hostname = False
+        for rule in rules:
+            if hasattr(rule, 'to_mongo'):
+                rule = rule.to_mongo()
+            if not self.version:
+                content_hash.update(json.dumps(rule, sort_keys=True,
+                                               default=str).encode('utf-8'))
+            if any(x.get('match_type') != 'tag' for x in rule.get('conditions', [])):
+                self.uses_hostname = True
+            self.rules.append(CompiledRule(rule))
+        if not self.version:
+            self.version = content_hash.hexdigest()
+
+        for position, rule in enumerate(self.rules):
+            if not rule.index_keys:
+                self.always_check.append(position)
+                continue
+            kind, keys = rule.index_keys
+            index = self.attribute_index if kind == 'attribute' else self.hostname_index
+            for key in keys:
+                index.setdefault(key, []).append(position)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def candidates(self, attributes, hostname):
+        """
+        Return the Rules which possibly can match to the Host,
+        in the same order as the Rules are sorted
+
+        Args:
+            attributes (dict): Attributes of Host
+            hostname (string): Lowercase Hostname
+        """
+        if not self.attribute_index and not self.hostname_index:
+            return self.rules
+        positions = set(self.always_check)
+        positions.update(self.hostname_index.get(hostname, []))
+        if self.attribute_index:
+            for key, value in attributes.items():
+                positions.update(self.attribute_index.get((str(key).lower(),
+                                                           str(value).lower()), []))
+        return [self.rules[x] for x in sorted(positions)]
@@ -2,13 +2,14 @@
 Ansible Inventory Modul
 """
 #pylint: disable=too-many-arguments, no-member
+import sys
 import json
 import click
 
 from mongoengine.errors import DoesNotExist
 
 from application import app
-from application.models.host import Host
+from application.models.host import Host, host_updates
 from application.modules.debug import ColorCodes, attribute_table
 from application.modules.rule.filter import Filter
 from application.modules.rule.rewrite import Rewrite
@@ -17,6 +18,7 @@ from application.modules.ansible.models import AnsibleFilterRule, AnsibleRewrite
                                                AnsibleCustomVariablesRule
 from application.modules.ansible.rules import AnsibleVariableRule
 from application.modules.ansible.syncer import SyncAnsible
+from application.modules.ansible.inventory import InventorySnapshot
 from application.modules.ansible.site_syncer import SyncSites
 from application.helpers.cron import register_cronjob
 
@@ -50,6 +52,7 @@ def load_rules():
 #   .-- Debug Host
 @cli_ansible.command('debug_host')
 @click.argument("hostname")
+@host_updates.unit_of_work
 def debug_ansible_rules(hostname):
     """
     Print matching rules and Inventory Outcome for Host
@@ -104,18 +107,11 @@ def _inner_udpate_cache():
     Update Cache of Ansible
     """
     print(f"{ColorCodes.OKGREEN}Delete current Cache{ColorCodes.ENDC}")
-    for host in Host.get_export_hosts():
-        if 'ansible' in host.cache:
-            del host.cache['ansible']
-            host.save()
-    print(f"{ColorCodes.OKGREEN}Build new Cache{ColorCodes.ENDC}")
-    rules = load_rules()
-    syncer = SyncAnsible()
-    syncer.filter = rules['filter']
-    syncer.rewrite = rules['rewrite']
-    syncer.actions = rules['actions']
-    # Do the action which triggers the caches
-    syncer.get_full_inventory()
+    Host._get_collection().update_many( # pylint: disable=protected-access
+            {'cache.ansible': {'$exists': True}}, {'$unset': {'cache.ansible': ''}})
+    print(f"{ColorCodes.OKGREEN}Build new Cache and Inventory Snapshot{ColorCodes.ENDC}")
+    # Calculates every Host, which triggers the caches
+    InventorySnapshot(load_rules).update(full=True, wait=True)
 
 @cli_ansible.command('update_cache')
 def update_cache():
@@ -139,7 +135,16 @@ def source(list, host): #pylint: disable=redefined-builtin
     syncer.actions = rules['actions']
 
     if list:
-        print(json.dumps(syncer.get_full_inventory()))
+        # Streamed from the Snapshot, Host by Host
+        snapshot = InventorySnapshot(load_rules)
+        state = snapshot.update()
+        if not state.etag:
+            # Never print an empty Inventory, Ansible would remove all Hosts
+            print("Inventory not built yet", file=sys.stderr)
+            sys.exit(1)
+        for chunk in snapshot.iter_json(state.version):
+            sys.stdout.write(chunk)
+        sys.stdout.write("\n")
         return True
     elif host:
         print(json.dumps(syncer.get_host_inventory(host)))
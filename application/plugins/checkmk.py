@@ -22,7 +22,7 @@ from application.modules.checkmk.models import CheckmkRewriteAttributeRule
 from application.modules.checkmk.rules import CheckmkRule
 from application.modules.checkmk.models import CheckmkRule as CheckmkRuleModel
 
-from application.models.host import Host
+from application.models.host import Host, host_updates
 
 def _load_rules():
     """
@@ -66,7 +66,7 @@ def show_hosts(disabled_only=False):
     syncer.actions = rules['actions']
 
 
-    for db_host in Host.get_export_hosts():
+    for db_host in Host.iter_hosts(Host.get_export_hosts()):
         attributes = syncer.get_host_attributes(db_host, 'checkmk')
         if not attributes:
             if disabled_only:
@@ -74,6 +74,7 @@ def show_hosts(disabled_only=False):
             continue
         if not disabled_only:
             print(db_host.hostname, attributes['filtered'])
+    host_updates.flush()
 #.
 #   . -- Show Labels
 @cli_cmk.command('show_labels')
@@ -91,7 +92,7 @@ def show_labels():
     syncer.actions = rules['actions']
 
     outcome = []
-    for db_host in Host.get_export_hosts():
+    for db_host in Host.iter_hosts(Host.get_export_hosts()):
         attributes = syncer.get_host_attributes(db_host, 'checkmk')
         if not attributes:
             continue
@@ -99,13 +100,15 @@ def show_labels():
         for key, value in attributes['filtered'].items():
             if (key, value) not in outcome:
                 outcome.append((key, value))
+    host_updates.flush()
 
     for key, value in outcome:
         print(f"{key}:{value}")
 #.
 #   .-- Command: Export Hosts
 
-def _inner_export_hosts(account, limit=False, dry_run=False, save_requests=False):
+def _inner_export_hosts(account, limit=False, dry_run=False, save_requests=False,
+                        full=False):
     try:
         target_config = get_account_by_name(account)
         if target_config:
@@ -113,6 +116,7 @@ def _inner_export_hosts(account, limit=False, dry_run=False, save_requests=False
             syncer = SyncCMK2()
             syncer.dry_run = dry_run
             syncer.save_requests = save_requests
+            syncer.force_full_sync = full
             syncer.account_id = str(target_config['_id'])
             syncer.account_name = target_config['name']
             syncer.limit = limit
@@ -138,7 +142,8 @@ def _inner_export_hosts(account, limit=False, dry_run=False, save_requests=False
 #@click.option("--debug", default=False, is_flag=True)
 @click.option("--dry-run", default=False, is_flag=True)
 @click.option("--save-requests", default='')
-def export_hosts(account, limit, dry_run, save_requests):
+@click.option("--full", default=False, is_flag=True)
+def export_hosts(account, limit, dry_run, save_requests, full):
     """
     Export Hosts to Checkmk
 
@@ -148,13 +153,15 @@ def export_hosts(account, limit, dry_run, save_requests):
     Args:
         account (string): Name Account Config
         limit (list): Comma separted list of Hosts
+        full (bool): Compare all Hosts, even if CMK_INCREMENTAL_EXPORT is set
     """
 
     limit_list = [x.strip() for x in limit.split(',') if x]
-    _inner_export_hosts(account, limit_list, dry_run, save_requests)
+    _inner_export_hosts(account, limit_list, dry_run, save_requests, full)
 #.
 #   .-- Command: Host Debug
 
+@host_updates.unit_of_work
 def get_debug_data(hostname):
     """
     Returns Debug Data
@@ -78,7 +78,8 @@ def cli_missing_hosts(account):
 
 @cli_cmk.command('export_rules')
 @click.argument("account")
-def cli_export_rules(account):
+@click.option("--dry-run", default=False, is_flag=True)
+def cli_export_rules(account, dry_run):
     """
     Export all configured Rules to given Checkmk Installations
 
@@ -88,8 +89,9 @@ def cli_export_rules(account):
 
     Args:
         account (string): Name Checkmk Account Config
+        dry_run (bool): Only print what would be created and deleted
     """
-    export_rules(account)
+    export_rules(account, dry_run)
 
 #.
 #   .-- Command: Export Group
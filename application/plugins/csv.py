@@ -5,18 +5,20 @@ CSV Function
 import csv
 import click
 from application import app
-from application.models.host import Host
+from application.models.host import Host, host_updates
 from application.modules.plugin import Plugin
 from application.modules.debug import ColorCodes
 from application.helpers.get_account import get_account_by_name
 from application.helpers.cron import register_cronjob
 from application.helpers.inventory import run_inventory
+from application.helpers.importer import HostImporter
 
 @app.cli.group(name='csv')
 def _cli_csv():
     """CSV related commands"""
 
 
+@host_updates.unit_of_work
 def compare_hosts(csv_path, delimiter, hostname_field, label_filter):
     """
     Compare lists from hosts which not in syncer
@@ -26,11 +28,11 @@ def compare_hosts(csv_path, delimiter, hostname_field, label_filter):
         host_list = []
         # we need to load the full plugins then
         plugin = Plugin()
-        for host in Host.get_export_hosts():
+        for host in Host.iter_hosts(Host.get_export_hosts()):
             if label_filter in plugin.get_host_attributes(host, 'csv')['all']:
                 host_list.append(host.hostname)
     else:
-        host_list = list([x.hostname for x in Host.get_export_hosts()])
+        host_list = set(Host.get_export_hosts().distinct('hostname'))
     with open(csv_path, newline='', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile, delimiter=delimiter)
         for row in reader:
@@ -82,8 +84,15 @@ def import_hosts(csv_path=None, delimiter=";", hostname_field="host", account=No
         raise ValueError("No path given in account config")
 
     filename = csv_path.split('/')[-1]
+    if not account:
+        account = {
+            'id': f"csv_{filename}",
+            'name': filename,
+            'is_master': False,
+        }
     print(f"{ColorCodes.OKBLUE}Started {ColorCodes.ENDC}"\
           f"{ColorCodes.UNDERLINE}{filename}{ColorCodes.ENDC}")
+    importer = HostImporter(account)
     with open(csv_path, newline='', encoding=encoding) as csvfile:
         reader = csv.DictReader(csvfile, delimiter=delimiter)
         for row in reader:
@@ -95,17 +104,9 @@ def import_hosts(csv_path=None, delimiter=";", hostname_field="host", account=No
             if 'rewrite_hostname' in account and account['rewrite_hostname']:
                 hostname = Host.rewrite_hostname(hostname, account['rewrite_hostname'], row)
             print(f" {ColorCodes.OKGREEN}** {ColorCodes.ENDC} Update {hostname}")
-            host_obj = Host.get_host(hostname)
             del row[hostname_field]
-            host_obj.update_host(row)
-            if account:
-                do_save = host_obj.set_account(account_dict=account)
-            else:
-                do_save = True
-                host_obj.set_account(f"csv_{filename}", filename)
-
-            if do_save:
-                host_obj.save()
+            importer.add(hostname, row)
+    importer.finish()
 
 @_cli_csv.command('import_hosts')
 @click.argument("csv_path", default="")
@@ -15,13 +15,7 @@ def run(method, url, payload):
     """
     Run requests
     """
-    jobs = {
-        'get': requests.get(url, **payload),
-        'post': requests.post(url, **payload),
-        'put': requests.put(url, **payload),
-        'delete': requests.delete(url, **payload),
-    }
-    resp = jobs[method]
+    resp = requests.request(method, url, **payload)
 
     print(f"({resp.status_code}) {url}")
 
@@ -12,7 +12,7 @@ from application.modules.idoit.rules import IdoitVariableRule
 from application.modules.rule.rewrite import Rewrite
 from application.modules.debug import ColorCodes, attribute_table
 from application.modules.idoit.syncer import SyncIdoit
-from application.models.host import Host
+from application.models.host import Host, host_updates
 from application.helpers.get_account import get_account_by_name
 from application.helpers.cron import register_cronjob
 
@@ -97,6 +97,7 @@ def cli_export_hosts(account):
 #   .-- Command: debug hosts
 @_cli_idoit.command('debug_host')
 @click.argument("hostname")
+@host_updates.unit_of_work
 def idoit_host_debug(hostname):
     """
     Debug host rules
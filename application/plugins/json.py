@@ -14,6 +14,7 @@ from application.models.host import Host
 from application.modules.debug import ColorCodes
 from application.helpers.get_account import get_account_by_name
 from application.helpers.cron import register_cronjob
+from application.helpers.importer import HostImporter
 
 @app.cli.group(name='json')
 def _cli_json():
@@ -44,21 +45,17 @@ def import_hosts(json_path, hostname_field, account):
     print(f"{ColorCodes.OKBLUE}Started {ColorCodes.ENDC}"\
           f"{ColorCodes.UNDERLINE}{filename}{ColorCodes.ENDC}")
 
+    importer = HostImporter(account)
     with open(json_path, newline='', encoding='utf-8') as json_file:
         data = json.load(json_file)
         for host in data:
             hostname = host[hostname_field]
             del host[hostname_field]
             if 'rewrite_hostname' in account and account['rewrite_hostname']:
-                hostname = Host.rewrite_hostname(hostname, account['rewrite_hostname'], entry)
+                hostname = Host.rewrite_hostname(hostname, account['rewrite_hostname'], host)
             print(f" {ColorCodes.OKGREEN}** {ColorCodes.ENDC} Update {hostname}")
-            host_obj = Host.get_host(hostname)
-            host_obj.update_host(host)
-
-            do_save = host_obj.set_account(account_dict=account)
-
-            if do_save:
-                host_obj.save()
+            importer.add(hostname, host)
+    importer.finish()
 
 @app.cli.group(name='rest')
 def _cli_rest():
@@ -91,6 +88,7 @@ def import_hosts_json(account):
     data = response.json()
     logger.debug(f"Response JSON: {data}")
 
+    importer = HostImporter(account)
     for entry in data[account['data_key']]:
         hostname = entry[account['hostname_field']]
         del entry[account['hostname_field']]
@@ -98,13 +96,8 @@ def import_hosts_json(account):
             hostname = Host.rewrite_hostname(hostname, account['rewrite_hostname'], entry)
 
         print(f" {ColorCodes.OKGREEN}** {ColorCodes.ENDC} Update {hostname}")
-        host_obj = Host.get_host(hostname)
-        host_obj.update_host(entry)
-
-        do_save = host_obj.set_account(account_dict=account)
-
-        if do_save:
-            host_obj.save()
+        importer.add(hostname, entry)
+    importer.finish()
 
 @_cli_rest.command('import_hosts')
 @click.argument("account")
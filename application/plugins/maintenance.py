@@ -6,6 +6,7 @@ Maintenance Module
 import datetime
 import string
 import secrets
+import time
 import click
 from mongoengine.errors import DoesNotExist, ValidationError
 from application import app, logger
@@ -95,16 +96,22 @@ def delete_cache(cache_name):
     """
     Delete object Cache
     """
+    # Cached Outcomes store the Rule Versions they are calculated with,
+    # so after Rule Changes, this is not needed anymore
     print(f"{CC.HEADER} ***** Delete Cache ***** {CC.ENDC}")
-    for host in Host.objects():
-        logger.debug(f"Handling Host {host.hostname}")
-        if cache_name:
-            for key in list(host.cache.keys()):
-                if key.lower().startswith(cache_name):
-                    del host.cache[key]
-        else:
-            host.cache = {}
-        host.save()
+    collection = Host._get_collection() # pylint: disable=protected-access
+    if cache_name:
+        cache_keys = collection.aggregate([
+            {'$project': {'keys': {'$objectToArray': '$cache'}}},
+            {'$unwind': '$keys'},
+            {'$group': {'_id': '$keys.k'}},
+        ])
+        fields = {f"cache.{x['_id']}": "" for x in cache_keys \
+                    if x['_id'].lower().startswith(cache_name)}
+        if fields:
+            collection.update_many({}, {'$unset': fields})
+    else:
+        collection.update_many({}, {'$set': {'cache': {}}})
     print(f"{CC.OKGREEN}  ** {CC.ENDC}Done")
 
 #.
@@ -165,6 +172,101 @@ def reset_folder_pools():
     else:
         print(f"{CC.OKGREEN}  ** {CC.ENDC}Aborted")
 
+#.
+#   .-- Command: Benchmark Rules
+
+def _interpreted_rule_hits(rule_class, hostname):
+    """
+    Rule Matching like it was done before the Rules got compiled
+    """
+    # pylint: disable=protected-access
+    hits = 0
+    for rule in rule_class.rules:
+        rule = rule.to_mongo()
+        results = []
+        for condition in rule['conditions']:
+            if condition['match_type'] == 'tag':
+                results.append(rule_class._check_attribute_match(condition))
+            else:
+                results.append(rule_class._check_hostname_match(condition, hostname))
+        if rule['condition_typ'] == 'anyway' \
+                or (rule['condition_typ'] == 'any' and any(results)) \
+                or (rule['condition_typ'] == 'all' and all(results)):
+            hits += 1
+    return hits
+
+def _compiled_rule_hits(rule_class, hostname):
+    """
+    Rule Matching with the compiled Ruleset
+    """
+    hits = 0
+    for rule in rule_class.ruleset:
+        if rule.is_hit(rule_class.attributes, hostname.lower()):
+            hits += 1
+    return hits
+
+@_cli_sys.command('benchmark_rules')
+@click.option("--limit", default=1000)
+def benchmark_rules(limit):
+    """
+    Measure Hosts per Second for matching the Checkmk Rules,
+    interpreted and compiled.
+
+    ### Example
+    _./cmdbsyncer sys benchmark_rules --limit 5000_
+
+    Args:
+        limit (int): Number of Hosts to use
+    """
+    # pylint: disable=import-outside-toplevel
+    from application.plugins.checkmk import _load_rules
+    rule_classes = _load_rules()
+    hosts = [({**x.labels, **x.inventory}, x.hostname)
+             for x in Host.get_export_hosts().limit(limit)]
+    if not hosts:
+        print(f"{CC.WARNING}  ** {CC.ENDC}No Hosts found")
+        return
+
+    print(f"{CC.HEADER} ***** Benchmark Rules ({len(hosts)} Hosts) ***** {CC.ENDC}")
+    for name, rule_class in rule_classes.items():
+        start = time.time()
+        rule_class.ruleset # pylint: disable=pointless-statement
+        compile_time = time.time() - start
+        for label, check_function in [('interpreted', _interpreted_rule_hits),
+                                      ('compiled', _compiled_rule_hits)]:
+            start = time.time()
+            for attributes, hostname in hosts:
+                rule_class.attributes = attributes
+                check_function(rule_class, hostname)
+            duration = max(time.time() - start, 0.000001)
+            print(f"{CC.OKGREEN}  ** {CC.ENDC}{name} ({len(rule_class.ruleset)} Rules), "\
+                  f"{label}: {len(hosts)/duration:.1f} Hosts/sec")
+        print(f"{CC.OKBLUE}   * {CC.ENDC}{name}: Compile took {compile_time:.4f} sec")
+
+#.
+#   .-- Command: Ensure Indexes
+@_cli_sys.command('ensure_indexes')
+def ensure_indexes():
+    """
+    Create missing Indexes of the Host Collection,
+    and print how often each Index was used.
+
+    ### Example
+    _./cmdbsyncer sys ensure_indexes_
+    """
+    # pylint: disable=protected-access
+    print(f"{CC.HEADER} ***** Ensure Indexes ***** {CC.ENDC}")
+    Host.ensure_indexes()
+    if updated := Host.backfill_hostname_reversed():
+        print(f"{CC.OKBLUE}   * {CC.ENDC}Set reversed Hostname for {updated} Hosts")
+    collection = Host._get_collection()
+    sizes = collection.database.command('collStats', collection.name).get('indexSizes', {})
+    for stats in collection.aggregate([{'$indexStats': {}}]):
+        name = stats['name']
+        print(f"{CC.OKGREEN}  ** {CC.ENDC}{name}: {stats['accesses']['ops']} Uses "\
+              f"since {stats['accesses']['since']}, "\
+              f"Size: {sizes.get(name, 0) / 1024:.0f} KB")
+
 #.
 #   .-- Command: Show Accounts
 @_cli_sys.command('show_accounts')
@@ -8,6 +8,7 @@ from application.helpers.get_account import get_account_by_name
 from application.modules.debug import ColorCodes as CC
 from application.helpers.cron import register_cronjob
 from application.helpers.inventory import run_inventory
+from application.helpers.importer import HostImporter
 
 try:
     import pypyodbc as pyodbc
@@ -65,16 +66,12 @@ def mssql_import(account):
     Mssql Import
     """
     config = get_account_by_name(account)
+    importer = HostImporter(config)
     for hostname, labels in _innter_sql(config):
         print(f" {CC.OKGREEN}* {CC.ENDC} Check {hostname}")
         del labels[config['hostname_field']]
-        host_obj = Host.get_host(hostname)
-        host_obj.update_host(labels)
-        do_save=host_obj.set_account(account_dict=config)
-        if do_save:
-            host_obj.save()
-        else:
-            print(f" {CC.WARNING} * {CC.ENDC} Managed by diffrent master")
+        importer.add(hostname, labels)
+    importer.finish()
 
 
 
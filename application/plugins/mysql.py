@@ -7,6 +7,7 @@ from application.helpers.get_account import get_account_by_name
 from application.modules.debug import ColorCodes
 from application.helpers.cron import register_cronjob
 from application.helpers.inventory import run_inventory
+from application.helpers.importer import HostImporter
 try:
     import mysql.connector
 except ImportError:
@@ -39,6 +40,7 @@ def mysql_import(account):
     mycursor.execute(query)
     all_hosts = mycursor.fetchall()
     field_names = config['fields'].split(',')
+    importer = HostImporter(config)
     for line in all_hosts:
         labels = dict(zip(field_names, line))
         if not labels[config['hostname_field']]:
@@ -50,15 +52,8 @@ def mysql_import(account):
             continue
         print(f" {ColorCodes.OKGREEN}* {ColorCodes.ENDC} Check {hostname}")
         del labels[config['hostname_field']]
-
-        host_obj = Host.get_host(hostname)
-        host_obj.update_host(labels)
-        do_save = host_obj.set_account(account_dict=config)
-        if do_save:
-            print(f" {ColorCodes.OKBLUE} * {ColorCodes.ENDC} Updated Labels")
-            host_obj.save()
-        else:
-            print(f" {ColorCodes.WARNING} * {ColorCodes.ENDC} Managed by diffrent master")
+        importer.add(hostname, labels)
+    importer.finish()
 
 def mysql_inventorize(account):
     """
@@ -5,7 +5,7 @@ Handle Netbox
 import click
 from mongoengine.errors import DoesNotExist
 
-from application.models.host import Host
+from application.models.host import Host, host_updates
 from application import app
 from application.modules.debug import ColorCodes, attribute_table
 from application.helpers.get_account import get_account_by_name
@@ -90,6 +90,7 @@ def cli_netbox_host_import(account):
 #   .-- Command: Debug Hosts
 @cli_netbox.command('debug_host')
 @click.argument("hostname")
+@host_updates.unit_of_work
 def netbox_host_debug(hostname):
     """Debug Host Rules"""
     print(f"{ColorCodes.HEADER} ***** Run Rules ***** {ColorCodes.ENDC}")
@@ -24,9 +24,8 @@ class ConfigModelView(DefaultModelView):
         """
         Delete all Caches
         """
-        for host in Host.objects():
-            host.cache = {}
-            host.save()
+        # pylint: disable=protected-access
+        Host._get_collection().update_many({}, {'$set': {'cache': {}}})
         return "Activation Done"
 
     def is_accessible(self):
@@ -281,6 +281,16 @@ class HostModelView(DefaultModelView):
 
         super().__init__(model, **kwargs)
 
+    def on_model_change(self, form, model, is_created):
+        """
+        Give edited Hosts a new Change Sequence Number,
+        so that incremental Exports see the Change
+        """
+        # pylint: disable=protected-access
+        if is_created or model._get_changed_fields():
+            model.mark_changed()
+        return super().on_model_change(form, model, is_created)
+
     def is_accessible(self):
         """ Overwrite """
         return current_user.is_authenticated and current_user.has_right('host')
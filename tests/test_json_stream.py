@@ -0,0 +1,64 @@
+"""
+Tests for the streaming JSON Parser
+"""
+import json
+import unittest
+
+from application.helpers.json_stream import iter_json_array
+
+
+def _chunks(data, size):
+    """
+    Split data in Chunks of size Bytes
+    """
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterJsonArray(unittest.TestCase):
+    """
+    iter_json_array must not depend on how the Data is split
+    """
+    document = {
+        'links': [{'rel': 'self', 'href': 'x'}],
+        'value': [
+            {'id': 'host1', 'extensions': {'folder': '/', 'attributes': {'labels': {}}}},
+            {'id': 'höst2', 'n': [1, -2.5, 3e3, 1.5E-2, 0], 'flag': True, 'none': None},
+            12,
+            1.5,
+            "text with \"quotes\" and ] } ,",
+        ],
+        't': 1.5,
+        'count': 10,
+    }
+
+    def test_chunk_sizes(self):
+        """
+        Same Result for every Chunk Size
+        """
+        data = json.dumps(self.document).encode('utf-8')
+        for size in (1, 2, 3, 7, len(data)):
+            with self.subTest(size=size):
+                result = list(iter_json_array(_chunks(data, size), 'value'))
+                self.assertEqual(result, self.document['value'])
+
+    def test_number_split_at_chunk(self):
+        """
+        Floats and Exponents split between two Chunks
+        """
+        data = b'{"value":[1],"t":1.5}'
+        for size in (1, 2, 3):
+            with self.subTest(size=size):
+                self.assertEqual(list(iter_json_array(_chunks(data, size), 'value')), [1])
+        self.assertEqual(list(iter_json_array([b'{"value":[1', b'.5, 1', b'e3]}'], 'value')),
+                         [1.5, 1000.0])
+
+    def test_empty_list(self):
+        """
+        Empty or missing List
+        """
+        self.assertEqual(list(iter_json_array([b'{"value": []}'], 'value')), [])
+        self.assertEqual(list(iter_json_array([b'{"other": [1]}'], 'value')), [])
+
+
+if __name__ == '__main__':
+    unittest.main()